@@ -0,0 +1,337 @@
+"""
+usage:
+python bench.py [bench_name_regex]
+"""
+import sys, re, time
+
+default_name = r'.*'
+name = sys.argv[1] if len(sys.argv) >= 2 else default_name
+name_pattern = re.compile(r'^bench_(%s)$' % name)
+
+
+def timing(func, *args, **kwargs):
+    start = time.perf_counter()
+    res = func(*args, **kwargs)
+    return time.perf_counter() - start, res
+
+
+def bench_voxel_construct():
+    """
+    compare `VoxelEngine` (per-voxel `bitmap`) and `VectorizedVoxelEngine`.
+    """
+    from symplus.euclid import Halfspace, Sphere
+    from magicpy.solid.marching import cube_engine, VoxelEngine, VectorizedVoxelEngine
+
+    zets = [Sphere(), Halfspace(1, [1,1,0])]
+    print('%-4s %-18s %12s %12s %8s'%('n', 'primitive', 'bitmap(s)', 'numpy(s)', 'same'))
+    for n in (10, 20, 40):
+        engine1 = cube_engine(2.0, n, VoxelEngine)
+        engine2 = cube_engine(2.0, n, VectorizedVoxelEngine)
+        engine2.voxels.points
+        for zet in zets:
+            t1, sub1 = timing(engine1.construct, zet)
+            t2, sub2 = timing(engine2.construct, zet)
+            print('%-4d %-18s %12.4f %12.4f %8s'%(n, type(zet).__name__, t1, t2, sub1 == sub2))
+
+
+def in_fresh_process(func, *args, **kwargs):
+    """
+    call `func` in new spawned process, so that caches warmed by previous
+    runs (sympy, interning, rasterization) are not shared.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(func, *args, **kwargs).result()
+
+
+def _simplify_museum_cells(name, incremental):
+    from sympy import sympify
+    from symplus.matplus import i, j, k
+    from symplus.euclid import Box, Halfspace
+    from magicpy.solid.sym import SymbolicSolidEngine, SymbolicSolidEngineVolumeAlgo
+    from magicpy.solid.marching import cube_engine
+    from magicpy.puzzle.phy import SymbolicPhysicalPuzzle
+
+    unit = sympify(2)/3
+    offset = unit/7
+    if name == 'RubiksCube':
+        pzl = SymbolicPhysicalPuzzle([Box()]).cross_common(
+            (Halfspace( unit, d), Halfspace(-unit,-d)) for d in [i,-i,j,-j,k,-k])
+    elif name == 'MirrorCube':
+        pzl = SymbolicPhysicalPuzzle([Box(center=[offset, 3*offset, 5*offset])]).cross_common(
+            (Halfspace( unit, d), Halfspace(-unit, d)&Halfspace(-unit,-d), Halfspace( unit,-d))
+            for d in [i,j,k])
+
+    engine = SymbolicSolidEngineVolumeAlgo(cube_engine())
+    engine.incremental = incremental
+    t, res = timing(engine.simplify, pzl)
+    # results are compared structurally, since arguments may be reordered by
+    # pickling
+    return t, sorted(SymbolicSolidEngine.signature_of(engine, zet) for zet in res)
+
+def bench_volalgo():
+    """
+    compare naive and incremental `SymbolicSolidEngineVolumeAlgo._volalgo` on
+    the museum puzzles, each in fresh process.
+    """
+    print('%-12s %12s %12s %8s'%('puzzle', 'naive(s)', 'incr(s)', 'same'))
+    for name in ['MirrorCube', 'RubiksCube']:
+        t1, res1 = in_fresh_process(_simplify_museum_cells, name, False)
+        t2, res2 = in_fresh_process(_simplify_museum_cells, name, True)
+        print('%-12s %12.4f %12.4f %8s'%(name, t1, t2, res1 == res2))
+
+
+def bench_numeric_mode(n=100):
+    """
+    compare cost per move of scrambling primitives by `n` moves in exact and
+    numeric mode of `symplus.euclid`, and print time of move at every 10
+    moves.
+    """
+    from sympy import pi
+    from symplus.matplus import i, j, k
+    from symplus.setplus import Image
+    from symplus.affine import rotation
+    from symplus.euclid import Halfspace, Cylinder, numeric_mode
+
+    moves = [rotation(pi/2, i), rotation(pi/4, j), rotation(pi/3, [1,1,1])]
+    def scramble(zet, n):
+        times = []
+        for m in range(n):
+            t, zet = timing(Image, moves[m%len(moves)], zet, evaluate=True)
+            times.append(t)
+        return times
+
+    print('%-10s %-6s %12s %12s'%('primitive', 'moves', 'exact(s)', 'float(s)'))
+    for zet in (Halfspace(1, [1,2,0]), Cylinder(1, 2, [1,0,0], [0,1,1])):
+        exact = scramble(zet, n)
+        with numeric_mode(1e-9):
+            numeric = scramble(zet, n)
+        for m in [1] + list(range(10, n+1, 10)):
+            print('%-10s %-6d %12.4f %12.4f'%(type(zet).__name__, m, exact[m-1], numeric[m-1]))
+
+
+def bench_expression_growth(n=100):
+    """
+    apply `n` random moves to halfspace by `SymbolicSolidEngine.transform`
+    with and without canonicalization, and print time per move and size of
+    expression for every 10 moves.
+    """
+    import random
+    from sympy import pi, count_ops
+    from symplus.matplus import i, j, k
+    from symplus.affine import rotation
+    from symplus.euclid import Halfspace
+    from magicpy.solid.sym import SymbolicSolidEngine
+
+    moves = [rotation(pi/2, i), rotation(2*pi/3, [1,1,1]), rotation(pi/4, j), rotation(pi/5, k)]
+    print('%-6s %-6s %12s %8s'%('canon', 'moves', 'move(s)', 'size'))
+    for canon in (False, True):
+        engine = SymbolicSolidEngine()
+        engine.canonicalization = canon
+        rand = random.Random(0)
+        zet = Halfspace(1, [1,2,0])
+        total = 0.0
+        for m in range(1, n+1):
+            t, (zet,) = timing(engine.transform, [zet], rand.choice(moves))
+            total += t
+            if m % 10 == 0:
+                print('%-6s %-6d %12.4f %8d'%(canon, m, total/10, count_ops(zet)))
+                total = 0.0
+
+
+def bench_logicrelsimp():
+    """
+    compare `logicrelsimp` by truth table and by multi-valued cubes, on random
+    expressions of growing numbers of linear relations.
+    """
+    import random
+    from sympy import symbols, And, Or
+    from symplus.simplus import logicrelsimp, simplification_cache
+
+    x, y, z = symbols('x y z')
+    def relations(n, rand):
+        rels = []
+        for m in range(n):
+            a = sum(rand.randint(-3, 3)*v for v in (x, y, z)) + rand.randint(-2, 2)
+            rels.append(a > 0 if m % 2 else a <= 0)
+        return rels
+    def expression(rels, rand):
+        terms = [And(*rand.sample(rels, 2)) for _ in rels]
+        return Or(*terms)
+
+    simplification_cache.disable()
+    print('%-4s %12s %12s %8s'%('n', 'table(s)', 'cube(s)', 'terms'))
+    for n in (2, 3, 4, 5, 8, 12, 16, 25):
+        rand = random.Random(n)
+        expr = expression(relations(n, rand), rand)
+        if n <= 4:
+            t1, _ = timing(logicrelsimp, expr, method='table')
+            t1 = '%12.4f'%t1
+        else:
+            t1 = '%12s'%'-'
+        t2, res = timing(logicrelsimp, expr, method='cube')
+        print('%-4d %s %12.4f %8d'%(n, t1, t2, len(Or.make_args(res))))
+    simplification_cache.enable()
+
+
+def bench_partition():
+    """
+    compare `SolidEngine.cross_common` by full product and by cells pruned cut
+    by cut, on NxNxN cubes.
+    """
+    from sympy import Rational
+    from symplus.matplus import i, j, k
+    from symplus.euclid import Box, Halfspace
+    from magicpy.solid.sym import SymbolicSolidEngineVolumeAlgo
+    from magicpy.solid.marching import cube_engine, PackedVoxelEngine
+
+    def cuts(n):
+        unit = Rational(2, n)
+        offsets = [-1+unit*m for m in range(1, n)]
+        return [(Halfspace(o, d), Halfspace(-o, -d)) for d in [i,j,k] for o in offsets]
+
+    def cells(engine, cols):
+        return [zet for zet in engine.cross_common(cols) if not engine.is_null(zet)]
+
+    print('%-4s %8s %12s %12s %8s %8s'%('n', 'product', 'product(s)', 'pruned(s)', 'cells', 'same'))
+    for n in (3, 4, 5):
+        cols = [(Box(),)] + cuts(n)
+        engine1 = SymbolicSolidEngineVolumeAlgo(cube_engine(1.5, 10, PackedVoxelEngine))
+        engine2 = SymbolicSolidEngineVolumeAlgo(cube_engine(1.5, 10, PackedVoxelEngine))
+        engine2.prune_cells = True
+        t1, res1 = timing(cells, engine1, cols)
+        t2, res2 = timing(cells, engine2, cols)
+        print('%-4d %8d %12.4f %12.4f %8d %8s'%(n, 2**(len(cols)-1), t1, t2, len(res2), res1 == res2))
+
+
+def bench_interning():
+    """
+    count distinct set nodes of pieces of `RubiksCube` after a turn, with and
+    without interning.
+    """
+    from sympy import pi
+    from sympy.sets import Set
+    from symplus.matplus import i
+    from symplus.affine import rotation
+    from symplus.setplus import intern_table
+    from magicpy.solid.sym import SymbolicSolidEngine, _canonical_image_
+    from magicpy.museum.RubiksCube import RubiksCube
+
+    def nodes(zets):
+        seen = {}
+        stack = list(zets)
+        while stack:
+            zet = stack.pop()
+            if id(zet) not in seen:
+                seen[id(zet)] = zet
+                stack.extend(arg for arg in zet.args if isinstance(arg, Set))
+        return len(seen)
+
+    print('%-8s %12s %8s %8s'%('intern', 'turn(s)', 'nodes', 'table'))
+    for interning in (False, True):
+        intern_table.clear()
+        _canonical_image_.cache_clear()
+        engine = SymbolicSolidEngine()
+        engine.interning = interning
+        t, zets = timing(engine.transform, list(RubiksCube), rotation(pi/2, i))
+        print('%-8s %12.4f %8d %8d'%(interning, t, nodes(zets), len(intern_table)))
+
+
+def bench_discrete(n=100000):
+    """
+    compile `RubiksCube` under quarter turns of six faces, and compare moves
+    per second of geometric puzzle and discrete model on batch of `n` states.
+    """
+    import random
+    from sympy import pi
+    from symplus.matplus import i, j, k
+    from symplus.affine import rotate, identity
+    from symplus.euclid import Halfspace
+    from magicpy.puzzle.phy import SymbolicPartitionalOperation
+    from magicpy.puzzle.discrete import compile_puzzle
+    from magicpy.museum.RubiksCube import RubiksCube, unit
+
+    ops = [SymbolicPartitionalOperation({Halfspace(unit, d): rotate(pi/2, d),
+                                         Halfspace(-unit, -d): identity()})
+           for d in [i,-i,j,-j,k,-k]]
+    t, model = timing(compile_puzzle, RubiksCube, ops)
+    print('compile: %.4fs, %d slots, %d orientations'%(t, model.size, len(model.motions)))
+
+    rand = random.Random(0)
+    moves = [rand.randrange(len(ops)) for _ in range(20)]
+    pzl = RubiksCube
+    t1, _ = timing(lambda: [op.transform(pzl) for op in map(ops.__getitem__, moves[:5])])
+    batch = model.initial()
+    pieces = batch.pieces.repeat(n).reshape(-1, n).T.copy()
+    oris = batch.oris.repeat(n).reshape(-1, n).T.copy()
+    def run(pieces, oris):
+        for g in moves:
+            pieces, oris = model.move(pieces, oris, g)
+        return pieces, oris
+    t2, _ = timing(run, pieces, oris)
+    print('%-10s %14s'%('model', 'moves/s'))
+    print('%-10s %14.1f'%('geometry', 5/t1))
+    print('%-10s %14.1f'%('discrete', len(moves)*n/t2))
+
+def bench_explorer(depth=10):
+    """
+    explore `FifteenPuzzle` breadth first to `depth`, with visited set kept in
+    memory or spilled to disk every 1000 keys.
+    """
+    import tempfile
+    from magicpy.puzzle.search import Explorer
+    from magicpy.museum.FifteenPuzzle import pzl, up, down, left, right
+
+    print('%-10s %10s %10s %14s'%('maxmem', 'time', 'states', 'states/s'))
+    for maxmem in [1<<20, 1000]:
+        explorer = Explorer(pzl, [up, down, left, right], tempfile.mkdtemp(), maxmem=maxmem)
+        t, stats = timing(explorer.run, max_depth=depth)
+        print('%-10d %10.4f %10d %14.1f'%(maxmem, t, stats.visited, stats.visited/t))
+
+def bench_fifteen(n=1000, instances=5, walk=60):
+    """
+    compare moves per second of `FifteenPuzzle` and `PackedFifteenPuzzle` by
+    random moves, and solve time of IDA* over random instances given by random
+    walk of length `walk`.
+    """
+    import random
+    from magicpy.museum.FifteenPuzzle import (pzl, up, down, left, right,
+        packed_pzl, packed_moves, solve, _get_conflict_tables,
+        BLANK_MOVES, OPPOSITE_MOVES)
+
+    rand = random.Random(0)
+    moves = [rand.randrange(4) for _ in range(n)]
+    def run(p, ops, moves):
+        for d in moves:
+            p = ops[d].apply(p)
+        return p
+    t1, _ = timing(run, pzl, [up, down, left, right], moves[:n//10])
+    t2, _ = timing(run, packed_pzl, packed_moves, moves)
+    print('%-10s %14s'%('puzzle', 'moves/s'))
+    print('%-10s %14.1f'%('matrix', n//10/t1))
+    print('%-10s %14.1f'%('packed', n/t2))
+
+    t, _ = timing(_get_conflict_tables)
+    print('conflict tables: %.4fs'%t)
+    print('%-10s %10s %10s'%('instance', 'time', 'length'))
+    for m in range(instances):
+        # random walk without stepping back
+        p = packed_pzl
+        last = None
+        for _ in range(walk):
+            d = rand.choice([d for d in range(4) if BLANK_MOVES[d][p.blank] != -1
+                             and (last is None or d != OPPOSITE_MOVES[last])])
+            p = packed_moves[d].apply(p)
+            last = d
+        t, ops = timing(solve, p)
+        print('%-10d %10.4f %10d'%(m, t, len(ops)))
+
+
+if __name__ == '__main__':
+    benchs = sorted(k for k in list(globals()) if name_pattern.match(k))
+    for bench in benchs:
+        print('%s:'%bench)
+        globals()[bench]()
+        print('')
@@ -114,3 +114,294 @@ up = MoveUpOperation()
 down = MoveDownOperation()
 left = MoveLeftOperation()
 right = MoveRightOperation()
+
+
+# packed representation: the tile at position `p` is stored in bits
+# `4*p:4*p+4` of 64-bit integer, where blank is 0, so that a move is a few
+# bitwise operations instead of building matrix and permutation.
+
+def _pack(tiles):
+    code = 0
+    for p, t in enumerate(tiles):
+        code |= t << 4*p
+    return code
+
+def _unpack(code):
+    return [(code >> 4*p) & 15 for p in range(16)]
+
+# BLANK_MOVES[d][p]: where the blank at position `p` goes by the move `d` (up,
+# down, left, right), or -1 if it cannot.
+BLANK_MOVES = (
+    tuple(p-4 if p >= 4 else -1 for p in range(16)),
+    tuple(p+4 if p < 12 else -1 for p in range(16)),
+    tuple(p-1 if p % 4 != 0 else -1 for p in range(16)),
+    tuple(p+1 if p % 4 != 3 else -1 for p in range(16)),
+)
+# index of the opposite move
+OPPOSITE_MOVES = (1, 0, 3, 2)
+
+class PackedFifteenPuzzle(Puzzle):
+    """
+    fifteen puzzle packed into integer `code`, where 4 bits per tile; `blank`
+    is the position of blank.  tiles are checked to be permutation when
+    constructed if `check` is set; swapping tiles keeps it, so only the
+    position of blank is checked after applying operation.
+
+    >>> p = PackedFifteenPuzzle()
+    >>> packed_left.apply(packed_up.apply(p))
+    PackedFifteenPuzzle([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 0, 11, 13, 14, 15, 12])
+    >>> packed_down.apply(p) == p
+    True
+    >>> PackedFifteenPuzzle.from_puzzle(up.apply(pzl)) == packed_up.apply(p)
+    True
+    >>> PackedFifteenPuzzle([1, 1, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 0])
+    Traceback (most recent call last):
+        ...
+    ValueError: not permutation of tiles
+    """
+    def __init__(self, code=_pack(list(range(1,16))+[0]), blank=None, check=True):
+        if not isinstance(code, int):
+            code = _pack(code)
+        if check and sorted(_unpack(code)) != list(range(16)):
+            raise ValueError("not permutation of tiles")
+        if blank is None:
+            blank = _unpack(code).index(0)
+        self.code = code
+        self.blank = blank
+
+    @classmethod
+    def from_puzzle(cls, pzl):
+        return cls(_pack(int(t) for t in pzl.mat))
+
+    def to_puzzle(self):
+        return FifteenPuzzle(self.tiles())
+
+    def tiles(self):
+        return _unpack(self.code)
+
+    def is_valid_state(self):
+        return (self.code >> 4*self.blank) & 15 == 0
+
+    def is_valid_elementary_operation(self, op):
+        if not isinstance(op, SwapOperation) or op.blank != self.blank:
+            return False
+        return op.tile == op.blank or op.tile in (d[op.blank] for d in BLANK_MOVES)
+
+    def is_solvable(self):
+        """
+        True if this state can be solved, by parity of permutation and
+        position of blank.
+        """
+        tiles = [t or 16 for t in self.tiles()]
+        inversions = sum(1 for i in range(16) for j in range(i+1, 16) if tiles[i] > tiles[j])
+        row, col = divmod(self.blank, 4)
+        return (inversions + (3-row) + (3-col)) % 2 == 0
+
+    def __eq__(self, other):
+        return isinstance(other, PackedFifteenPuzzle) and self.code == other.code
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def fingerprint(self):
+        return self.code.to_bytes(16, "little")
+
+    def __str__(self):
+        return str(self.to_puzzle())
+
+    def __repr__(self):
+        return "%s(%s)"%(type(self).__name__, self.tiles())
+
+packed_pzl = PackedFifteenPuzzle()
+
+
+class SwapOperation(Operation):
+    """
+    swap the blank at position `blank` with the tile at position `tile`.
+    """
+    def __init__(self, blank, tile):
+        self.blank = blank
+        self.tile = tile
+
+    def transform(self, pzl):
+        t = (pzl.code >> 4*self.tile) & 15
+        code = pzl.code & ~(15 << 4*self.tile) | (t << 4*self.blank)
+        return pzl.new(code, self.tile, check=False)
+
+    def __str__(self):
+        return "(%d %d)"%(self.blank, self.tile)
+
+    def __repr__(self):
+        return "%s(%d, %d)"%(type(self).__name__, self.blank, self.tile)
+
+class PackedMoveOperation(WrappedOperation):
+    """
+    move the blank of `PackedFifteenPuzzle` by `direction` (0, 1, 2, 3 for up,
+    down, left, right), which do nothing at the border.
+    """
+    symbols = ("[^]", "[v]", "[<]", "[>]")
+
+    def __init__(self, direction):
+        self.direction = direction
+
+    def interpret_for(self, pzl):
+        a = pzl.blank
+        b = BLANK_MOVES[self.direction][a]
+        return SwapOperation(a, a if b == -1 else b)
+
+    def __eq__(self, other):
+        return isinstance(other, PackedMoveOperation) and self.direction == other.direction
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((PackedMoveOperation, self.direction))
+
+    def __str__(self):
+        return self.symbols[self.direction]
+
+    def __repr__(self):
+        return str(self)
+
+packed_up = PackedMoveOperation(0)
+packed_down = PackedMoveOperation(1)
+packed_left = PackedMoveOperation(2)
+packed_right = PackedMoveOperation(3)
+packed_moves = (packed_up, packed_down, packed_left, packed_right)
+
+
+# heuristics of solver
+
+# MANHATTAN[t][p]: distance of tile `t` at position `p` from its goal
+MANHATTAN = tuple(tuple(0 if t == 0 else
+                        abs(p//4 - (t-1)//4) + abs(p%4 - (t-1)%4)
+                        for p in range(16)) for t in range(16))
+
+def _line_conflict(goals):
+    """
+    extra moves of tiles in their goal line, whose goals along the line are
+    `goals` in current order: 2 for each tile not in longest increasing
+    subsequence.
+    """
+    longest = []
+    for i, g in enumerate(goals):
+        longest.append(1 + max([longest[j] for j in range(i) if goals[j] < g] or [0]))
+    return 2*(len(goals) - max(longest or [0]))
+
+_conflict_tables = None
+
+def _get_conflict_tables():
+    """
+    tables of linear conflict of rows and columns, indexed by 16 bits of four
+    tiles in the line.
+    """
+    global _conflict_tables
+    if _conflict_tables is None:
+        rows = []
+        cols = []
+        for n in range(4):
+            row = []
+            col = []
+            for key in range(1 << 16):
+                line = [(key >> 4*i) & 15 for i in range(4)]
+                row.append(_line_conflict([(t-1)%4 for t in line if t and (t-1)//4 == n]))
+                col.append(_line_conflict([(t-1)//4 for t in line if t and (t-1)%4 == n]))
+            rows.append(row)
+            cols.append(col)
+        _conflict_tables = rows, cols
+    return _conflict_tables
+
+def _transpose(code):
+    return _pack(_unpack(code)[4*(p%4) + p//4] for p in range(16))
+
+def heuristic(pzl):
+    """
+    lower bound of number of moves to solve `PackedFifteenPuzzle` `pzl`, by
+    Manhattan distance and linear conflict.
+
+    >>> heuristic(packed_pzl)
+    0
+    >>> heuristic(PackedFifteenPuzzle([2, 1, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 0]))
+    4
+    """
+    rows, cols = _get_conflict_tables()
+    code = pzl.code
+    tcode = _transpose(code)
+    h = sum(MANHATTAN[t][p] for p, t in enumerate(_unpack(code)))
+    h += sum(rows[n][(code >> 16*n) & 0xffff] for n in range(4))
+    h += sum(cols[n][(tcode >> 16*n) & 0xffff] for n in range(4))
+    return h
+
+def solve(pzl, max_depth=80):
+    """
+    shortest sequence of `packed_moves` which solve `PackedFifteenPuzzle` (or
+    `FifteenPuzzle`) `pzl`, by IDA* search with `heuristic`.  return None if
+    not found within `max_depth` moves.
+
+    >>> p = packed_pzl
+    >>> for op in [packed_up, packed_left, packed_left, packed_down, packed_right]:
+    ...     p = op.apply(p)
+    >>> ops = solve(p)
+    >>> ops
+    ([<], [^], [>], [>], [v])
+    >>> for op in ops: p = op.apply(p)
+    >>> p == packed_pzl
+    True
+    """
+    if isinstance(pzl, FifteenPuzzle):
+        pzl = PackedFifteenPuzzle.from_puzzle(pzl)
+    if not pzl.is_solvable():
+        raise ValueError("unsolvable state")
+
+    rows, cols = _get_conflict_tables()
+    goal = packed_pzl.code
+    # each state is `(code, tcode, blank, manhattan)`, where `tcode` is the
+    # transposed board, so that conflicts of columns are looked up as rows.
+    def bound(code, tcode, md):
+        return (md + rows[0][code & 0xffff] + rows[1][(code >> 16) & 0xffff]
+                   + rows[2][(code >> 32) & 0xffff] + rows[3][code >> 48]
+                   + cols[0][tcode & 0xffff] + cols[1][(tcode >> 16) & 0xffff]
+                   + cols[2][(tcode >> 32) & 0xffff] + cols[3][tcode >> 48])
+
+    path = []
+    def search(code, tcode, blank, md, g, limit, last):
+        f = g + bound(code, tcode, md)
+        if f > limit:
+            return f
+        if code == goal:
+            return True
+        least = None
+        for d in range(4):
+            if last is not None and d == OPPOSITE_MOVES[last]:
+                continue
+            b = BLANK_MOVES[d][blank]
+            if b == -1:
+                continue
+            t = (code >> 4*b) & 15
+            tb = 4*(b%4) + b//4
+            ta = 4*(blank%4) + blank//4
+            path.append(d)
+            res = search(code & ~(15 << 4*b) | (t << 4*blank),
+                         tcode & ~(15 << 4*tb) | (t << 4*ta),
+                         b, md - MANHATTAN[t][b] + MANHATTAN[t][blank],
+                         g+1, limit, d)
+            if res is True:
+                return True
+            path.pop()
+            if least is None or res < least:
+                least = res
+        return least
+
+    code = pzl.code
+    md = sum(MANHATTAN[t][p] for p, t in enumerate(_unpack(code)))
+    limit = heuristic(pzl)
+    while limit is not None and limit <= max_depth:
+        res = search(code, _transpose(code), pzl.blank, md, 0, limit, None)
+        if res is True:
+            return tuple(packed_moves[d] for d in path)
+        limit = res
+    return None
@@ -42,7 +42,7 @@ advanced operation may depend on process of applying.  so for monoid-structured
 operation or others advanced operation, the validation process is directly
 implemented in `apply`.
 """
-from magicpy.util import thiz, map
+from magicpy.util import thiz, map, LRUCache
 
 
 class IllegalOperationError(Exception):
@@ -114,6 +114,13 @@ class Puzzle(object):
         """
         return type(self)(*args, **kwargs)
 
+    def fingerprint(self):
+        """
+        digest of this state, which is 16 bytes of `blake2b` of `repr`.
+        """
+        import hashlib
+        return hashlib.blake2b(repr(self).encode("utf-8"), digest_size=16).digest()
+
 class WrappedOperation(Operation):
     def interpret_for(self, pzl):
         """
@@ -211,8 +218,16 @@ class ContinuousOperation(Operation):
     """
     operation which operate continuously.
     continuous operation can be cutted to any distance.
+    the motion is checked by `sweep` mode: "fixed" checks frames with step
+    `1/density`; "adaptive" bisects the distance, skips intervals known to be
+    free, and refines the others until shorter than `tolerance`.
     """
     density = 10.0
+    sweep = "fixed"
+    tolerance = 0.01
+    # statistics of sweeps, accumulated on the class of operation
+    sweeps = 0
+    checked_frames = 0
 
     @property
     def distance(self):
@@ -233,10 +248,7 @@ class ContinuousOperation(Operation):
         if not pzl.is_valid_elementary_operation(self):
             raise IllegalOperationError
 
-        for t in range(int(self.distance*self.density)+1):
-            moved = self.to(t/self.density).transform(pzl)
-            if not moved.is_valid_state():
-                raise IllegalOperationError
+        self.record_sweep(self.sweep_frames(lambda dis: self.to(dis).transform(pzl).is_valid_state()))
 
         pzl = self.transform(pzl)
         if not pzl.is_valid_state():
@@ -244,6 +256,55 @@ class ContinuousOperation(Operation):
 
         return pzl
 
+    def record_sweep(self, frames):
+        """
+        add the number of evaluated frames of a sweep to statistics.
+        """
+        cls = type(self)
+        cls.sweeps += 1
+        cls.checked_frames += frames
+        return frames
+
+    def sweep_frames(self, is_valid_at, is_free_between=None):
+        """
+        check frames `is_valid_at(dis)` along this operation by `sweep` mode,
+        and return the number of evaluated frames.
+        `is_free_between(dis1, dis2)` tells whether interval between valid
+        frame `dis1` and `dis2` is surely valid, which is used by adaptive
+        mode.
+        """
+        if self.sweep == "fixed":
+            frames = int(self.distance*self.density)+1
+            for t in range(frames):
+                if not is_valid_at(t/self.density):
+                    raise IllegalOperationError(t/self.density)
+            return frames
+
+        elif self.sweep == "adaptive":
+            distance = float(self.distance)
+            frames = 2
+            if not is_valid_at(0.0):
+                raise IllegalOperationError(0.0)
+            if not is_valid_at(distance):
+                raise IllegalOperationError(distance)
+            intervals = [(0.0, distance)]
+            while intervals:
+                dis1, dis2 = intervals.pop()
+                if dis2 - dis1 <= self.tolerance:
+                    continue
+                if is_free_between is not None and is_free_between(dis1, dis2):
+                    continue
+                dis = (dis1 + dis2)/2
+                frames += 1
+                if not is_valid_at(dis):
+                    raise IllegalOperationError(dis)
+                intervals.append((dis, dis2))
+                intervals.append((dis1, dis))
+            return frames
+
+        else:
+            raise ValueError
+
 
 class TensorPuzzle(Puzzle, tuple):
     """
@@ -393,6 +454,26 @@ class CombinationalPuzzle(Puzzle, tuple):
     def __hash__(self):
         return hash((type(self), tuple(self)))
 
+    def fingerprint(self):
+        """
+        canonical digest of this state, which is 16 bytes of `blake2b` of
+        sorted signatures of elements.  so states of the same elements have
+        the same fingerprint, even if the elements are in different order or
+        differently expressed.
+        """
+        import hashlib, struct
+        digest = hashlib.blake2b(digest_size=16)
+        for sig in sorted(map(self.elem_signature, self)):
+            digest.update(struct.pack("<Q", len(sig)))
+            digest.update(sig)
+        return digest.digest()
+
+    def elem_signature(self, elem):
+        """
+        canonical bytes of element `elem` for `fingerprint`.
+        """
+        return repr(elem).encode("utf-8")
+
 class CombinationalOperation(Operation, tuple):
     """
     operation that operate elements of combinational puzzle separately.
@@ -465,23 +546,61 @@ class ContinuousCombinationalOperation(ContinuousOperation,
         """
         raise NotImplementedError
 
+class SelectionCache(LRUCache):
+    """
+    cache of whether element is in selection of `SelectiveOperation`, keyed
+    by type of operation, element and selection, so it is shared by all
+    states and operations containing them.  at most `maxsize` entries are
+    kept, and the least recently used ones are dropped.
+
+    >>> class ParityOperation(SelectiveOperation):
+    ...     selection_cache = SelectionCache()
+    ...     def elem_filter(self, elem, sel):
+    ...         return elem % 2 == sel
+    >>> op1 = ParityOperation({0: "a", 1: "b"})
+    >>> op2 = ParityOperation({0: "c", 1: "d"})
+    >>> list(op1.interpret_for((1, 2, 3))), list(op2.interpret_for((3, 2)))
+    (['b', 'a', 'b'], ['d', 'c'])
+    >>> ParityOperation.selection_cache.info()
+    CacheInfo(hits=3, misses=5, maxsize=65536, currsize=5)
+    """
+    def __init__(self, maxsize=65536):
+        LRUCache.__init__(self, maxsize)
+
+    def is_selected(self, op, elem, sel):
+        """
+        True if element `elem` is in the selection `sel` of operation `op`.
+        """
+        key = (type(op), elem, sel)
+        res = self.get(key)
+        if res is None:
+            res = bool(op.elem_filter(elem, sel))
+            self[key] = res
+        return res
+
 class SelectiveOperation(WrappedOperation, tuple):
     """
     operation that operate different elements of combinational puzzle
     separately by selecting.
     the data structure of `SelectiveOperation` is sorted items of dictionary,
-    where key is selection, value is action.
+    where key is selection, value is action.  element is interpreted by the
+    first selection containing it, so the order given by `selection_key`
+    decides overlapping selections; it is the order of selections themselves
+    by default, and `default_sort_key` for symbolic regions.
+    membership is memoized by `selection_cache` across puzzle states.
     """
     interpreted_type = CombinationalOperation
+    selection_cache = SelectionCache()
 
     def __new__(cls, *args, **kwargs):
-        return tuple.__new__(cls, sorted(dict(*args, **kwargs).iteritems()))
+        items = dict(*args, **kwargs).items()
+        return tuple.__new__(cls, sorted(items, key=lambda item: cls.selection_key(item[0])))
 
     def interpret_for(self, pzl):
         interpreted = []
         for elem in pzl:
             for sel, act in self:
-                if self.elem_filter(elem, sel):
+                if self.selection_cache.is_selected(self, elem, sel):
                     interpreted.append(act)
                     break
             else:
@@ -494,6 +613,13 @@ class SelectiveOperation(WrappedOperation, tuple):
         """
         raise NotImplementedError
 
+    @staticmethod
+    def selection_key(sel):
+        """
+        key of selection `sel` for sorting.
+        """
+        return sel
+
     def keys(self):
         return list(item[0] for item in self)
 
@@ -0,0 +1,257 @@
+"""
+this module compile symbolic physical puzzle into discrete model, whose state
+is integer arrays of pieces and orientations on slots.
+
+IDEA:
+for many puzzles, such as Rubik's cube, all reachable states are rigid motions
+of pieces among the same places.  then the place of pieces, called slot, can
+be identified by geometry of initial state, and each generator acts on slots as
+a permutation and a rigid motion, called twist, which is independent of state.
+the state of puzzle is described by which piece is in each slot and how it is
+oriented, where orientation is the rigid motion from its home slot.  the
+twists generate a finite group, so orientations are indexed and composed by
+table, and moves become array indexing without geometry.
+
+if image of some slot under generator is not a slot, such as the partial turn
+of shape-shifting puzzle (jumbling), the structure of group is broken; those
+generators are flagged, and the state should be realized as physical puzzle to
+fall back to geometry.
+"""
+from magicpy.puzzle.basic import Puzzle, Operation
+from magicpy.util import zip, range
+
+
+class JumblingError(Exception):
+    pass
+
+
+def _motion_key(motion, decimals=6):
+    import numpy
+    from symplus.affine import as_numeric
+    augmat = as_numeric(motion).augmat
+    return tuple((numpy.round(augmat, decimals) + 0.0).ravel().tolist())
+
+class DiscreteModel(object):
+    """
+    compiled model of puzzle, made by `compile_puzzle`.
+
+    `slots` are elements of initial state; `motions` are rigid motions of
+    orientations as `EuclideanTransformation`, where the first one is identity;
+    `compose[a, b]` is the index of `motions[a]*motions[b]`, or -1 if it is
+    not in `motions` (only possible for motions of jumbling generators), and
+    moving to such orientation raises `ValueError`.  for the `g`-th
+    generator, the piece in slot `s` goes to slot `perms[g, s]` and is twisted
+    by `motions[twists[g, s]]`; `jumbling[g]` are slots whose image is not a
+    slot, and such generator cannot be applied.
+    """
+    def __init__(self, slots, ops, motions, compose, perms, twists, jumbling):
+        import numpy
+        self.slots = tuple(slots)
+        self.ops = tuple(ops)
+        self.motions = tuple(motions)
+        self.compose = numpy.asarray(compose, dtype=numpy.intp)
+        self.perms = numpy.asarray(perms, dtype=numpy.intp)
+        self.twists = numpy.asarray(twists, dtype=numpy.intp)
+        self.jumbling = dict(jumbling)
+
+        # sources of each slot, so that moves are gathering by indices
+        self._srcs = numpy.zeros_like(self.perms)
+        self._twists = numpy.zeros_like(self.twists)
+        for g in range(len(self.ops)):
+            if g not in self.jumbling:
+                self._srcs[g, self.perms[g]] = numpy.arange(len(self.slots))
+                self._twists[g] = self.twists[g, self._srcs[g]]
+
+    @property
+    def size(self):
+        return len(self.slots)
+
+    def is_discrete(self, g):
+        """
+        True if the `g`-th generator keeps the structure of group.
+        """
+        return g not in self.jumbling
+
+    def initial(self):
+        return DiscretePuzzle(self)
+
+    def move(self, pieces, oris, g):
+        """
+        apply the `g`-th generator to arrays `pieces` and `oris`, whose last
+        axis is slot, so that batch of states can be moved at once.
+        """
+        if g in self.jumbling:
+            raise JumblingError(g)
+        src = self._srcs[g]
+        oris = self.compose[self._twists[g], oris[..., src]]
+        # -1 marks unknown composition, which numpy indexing would wrap
+        if (oris < 0).any():
+            raise ValueError("unknown composition of orientations")
+        return pieces[..., src], oris
+
+    def generators(self):
+        return tuple(DiscreteOperation(g) for g in range(len(self.ops)))
+
+def compile_puzzle(pzl, ops, check=False, max_motions=1024):
+    """
+    compile `SymbolicPhysicalPuzzle` `pzl` under generators `ops` (such as
+    `SymbolicPartitionalOperation`) into `DiscreteModel`.  slots are
+    identified by structural equality, or geometric equality of `pzl.engine`.
+    if `check` is True, motion of generators is checked on initial state, and
+    blocked generator raise `IllegalOperationError`.
+    """
+    from symplus.affine import EuclideanTransformation
+    from symplus.funcplus import compose as compose_
+
+    engine = pzl.engine
+    slots = tuple(pzl)
+    index = dict((slot, s) for s, slot in enumerate(slots))
+
+    def locate(zet):
+        s = index.get(zet)
+        if s is None:
+            s = next((s for s, slot in enumerate(slots)
+                      if engine.is_inside(zet, slot) and engine.is_inside(slot, zet)), None)
+        return s
+
+    identity = EuclideanTransformation()
+    motions = [identity]
+    keys = {_motion_key(identity): 0}
+    def motion_index(motion):
+        key = _motion_key(motion)
+        if key not in keys:
+            keys[key] = len(motions)
+            motions.append(motion)
+        return keys[key]
+
+    perms = []
+    twists = []
+    jumbling = {}
+    for g, op in enumerate(ops):
+        interpreted = op.interpret_for(pzl)
+        if check:
+            interpreted.check_motion(pzl)
+        perm = []
+        twist = []
+        for s, (slot, act) in enumerate(zip(slots, interpreted)):
+            if interpreted.action_is_identity(act):
+                perm.append(s)
+                twist.append(0)
+                continue
+            trans = act.forget()
+            perm.append(locate(interpreted.elem_transform(slot, act)))
+            twist.append(motion_index(trans))
+        if None in perm:
+            jumbling[g] = tuple(s for s, t in enumerate(perm) if t is None)
+            perm = [s if t is None else t for s, t in enumerate(perm)]
+        perms.append(perm)
+        twists.append(twist)
+
+    # close motions under twists, which is finite group for discrete puzzle
+    gens = sorted(set(t for g, twist in enumerate(twists) if g not in jumbling for t in twist))
+    n = 0
+    while n < len(motions):
+        for t in gens:
+            motion_index(compose_(motions[t], motions[n]))
+        if len(motions) > max_motions:
+            raise ValueError("orientations are not finite")
+        n += 1
+
+    compose = [[keys.get(_motion_key(compose_(a, b)), -1) for b in motions] for a in motions]
+    return DiscreteModel(slots, ops, motions, compose, perms, twists, jumbling)
+
+
+class DiscretePuzzle(Puzzle):
+    """
+    state of `DiscreteModel`, which is the piece and its orientation in each
+    slot.
+
+    >>> from magicpy.museum.RubiksCube import RubiksCube, unit
+    >>> from symplus.affine import rotate, identity
+    >>> from symplus.euclid import Halfspace
+    >>> from symplus.matplus import i, j
+    >>> from sympy import pi
+    >>> from magicpy.puzzle.phy import SymbolicPartitionalOperation as Op
+    >>> R = Op({Halfspace(unit, i): rotate(pi/2, i), Halfspace(-unit,-i): identity()})
+    >>> U = Op({Halfspace(unit, j): rotate(pi/2, j), Halfspace(-unit,-j): identity()})
+    >>> model = compile_puzzle(RubiksCube, [R, U])
+    >>> len(model.motions)
+    24
+    >>> r, u = model.generators()
+    >>> pzl = model.initial()
+    >>> r.apply(r.apply(pzl)) == pzl
+    False
+    >>> for _ in range(420): pzl = u.apply(r.apply(pzl))
+    >>> pzl == model.initial()
+    True
+    >>> R8 = Op({Halfspace(unit, i): rotate(pi/4, i), Halfspace(-unit,-i): identity()})
+    >>> compile_puzzle(RubiksCube, [R8]).jumbling
+    {0: (0, 1, 2, 3, 4, 5, 6, 7, 8)}
+    """
+    def __init__(self, model, pieces=None, oris=None):
+        import numpy
+        self.model = model
+        self.pieces = numpy.arange(model.size) if pieces is None else pieces
+        self.oris = numpy.zeros(model.size, dtype=numpy.intp) if oris is None else oris
+
+    def new(self, pieces=None, oris=None):
+        pieces = pieces if pieces is not None else self.pieces
+        oris = oris if oris is not None else self.oris
+        return type(self)(self.model, pieces, oris)
+
+    def is_valid_elementary_operation(self, op):
+        return isinstance(op, DiscreteOperation) and 0 <= op.generator < len(self.model.ops)
+
+    def to_physical(self, pzl):
+        """
+        realize this state as physical puzzle like `pzl`, to fall back to
+        geometry.
+        """
+        elems = []
+        for p, o in zip(self.pieces, self.oris):
+            trans = self.model.motions[o]
+            elems.append(pzl.engine.transform([self.model.slots[p]], trans)[0])
+        return pzl.new(elems)
+
+    def __eq__(self, other):
+        return bool(isinstance(other, DiscretePuzzle) and self.model is other.model and
+                    (self.pieces == other.pieces).all() and (self.oris == other.oris).all())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.pieces.tobytes(), self.oris.tobytes()))
+
+    def fingerprint(self):
+        import hashlib
+        digest = hashlib.blake2b(self.pieces.astype("<i4").tobytes(), digest_size=16)
+        digest.update(self.oris.astype("<i4").tobytes())
+        return digest.digest()
+
+    def __repr__(self):
+        return "%s(%s, %s)"%(type(self).__name__, self.pieces.tolist(), self.oris.tolist())
+
+class DiscreteOperation(Operation):
+    """
+    the `generator`-th generator of `DiscreteModel`.  jumbling generator raise
+    `JumblingError`.
+    """
+    def __init__(self, generator):
+        self.generator = generator
+
+    def transform(self, pzl):
+        pieces, oris = pzl.model.move(pzl.pieces, pzl.oris, self.generator)
+        return pzl.new(pieces, oris)
+
+    def __eq__(self, other):
+        return isinstance(other, DiscreteOperation) and self.generator == other.generator
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((DiscreteOperation, self.generator))
+
+    def __repr__(self):
+        return "%s(%r)"%(type(self).__name__, self.generator)
@@ -1,10 +1,18 @@
-from itertools import product, combinations, groupby
+import atexit, pickle
+from itertools import product, combinations, groupby, count
+from sympy.core.compatibility import lru_cache
+from sympy.core import Dummy
+from sympy.functions import sqrt
+from sympy.sets import Interval
+from sympy.calculus.util import maximum
 from sympy.simplify import simplify
+from sympy.utilities import default_sort_key
 from symplus.strplus import mstr
-from symplus.path import Path, IdentityPath
-from symplus.affine import SE3_star, SO3_star, T3_star
+from symplus.path import Path, IdentityPath, TransformationPath
+from symplus.affine import EuclideanTransformation, SE3_star, SO3_star, T3_star
 from symplus.euclid import T_RR3
-from magicpy.solid.marching import cube_engine
+from magicpy.solid.general import bound_radius
+from magicpy.solid.marching import cube_engine, PackedVoxelEngine
 from magicpy.solid.sym import SymbolicSolidEngineVolumeAlgo
 from magicpy.puzzle.basic import *
 
@@ -27,33 +35,128 @@ class PhysicalPuzzle(CombinationalPuzzle):
                                                        remain=remain,
                                                        err=err))
 
+    def elem_signature(self, elem):
+        return self.engine.signature_of(elem)
+
+    def iter_cross_common(self, cols, prune=None):
+        return self.engine.iter_cross_common([self]+list(cols), prune=prune)
+
     def partition_by(self, *objs):
         return self.new(self.engine.partition_by(self, *objs))
 
+    def iter_partition_by(self, *objs):
+        return self.engine.iter_partition_by(self, *objs)
+
     def transform(self, *transs):
         return self.new(self.engine.transform(self, *transs))
 
 
+# context of frame validation in worker process as `(key, context)`, which is
+# pickled once per sweep by the parent and unpickled once per worker
+_frame_context = None
+
+def _validate_frame(key, data, dis):
+    global _frame_context
+    if _frame_context is None or _frame_context[0] != key:
+        _frame_context = (key, pickle.loads(data))
+    op, moving_op, moving_pzl, still = _frame_context[1]
+    moved = moving_op.to(dis).transform(moving_pzl)
+    return op.is_valid_frame(moved, still)
+
 class PhysicalOperation(ContinuousCombinationalOperation):
+    """
+    physical operation, whose motion is checked only between moving groups
+    and against stationary elements.
+    frames of "fixed" sweep are checked by process pool with `workers`
+    processes if `workers` is set; the pool is kept for later sweeps until
+    `shutdown_frame_pool`, and the context of a sweep is pickled once.
+
+    the verdict is the same as checking collision of whole state at each
+    frame:
+
+    >>> from sympy import pi
+    >>> from symplus.affine import rotate, identity
+    >>> from symplus.euclid import Box, Halfspace
+    >>> from symplus.matplus import i, k
+    >>> pzl = SymbolicPhysicalPuzzle([Box()]).cross_common([(Halfspace(0, k), Halfspace(0,-k))])
+    >>> def check_all(op, pzl):
+    ...     frames = int(op.distance*op.density)+1
+    ...     return all(pzl.engine.no_collision(op.to(t/op.density).transform(pzl))
+    ...                for t in range(frames))
+    >>> turn = SymbolicPartitionalOperation({Halfspace(0, k): rotate(pi/2, k),
+    ...                                      Halfspace(0,-k): identity()}).interpret_for(pzl)
+    >>> flip = SymbolicPartitionalOperation({Halfspace(0, k): rotate(pi/2, i),
+    ...                                      Halfspace(0,-k): identity()}).interpret_for(pzl)
+    >>> check_all(turn, pzl), check_all(flip, pzl)
+    (True, False)
+    >>> turn.check_motion(pzl)
+    11
+    >>> flip.check_motion(pzl)
+    Traceback (most recent call last):
+        ...
+    magicpy.puzzle.basic.IllegalOperationError: 0.1
+
+    so does the process pool, which reports the first failing frame:
+
+    >>> turn.workers = flip.workers = 2
+    >>> turn.check_motion(pzl)
+    11
+    >>> flip.check_motion(pzl)
+    Traceback (most recent call last):
+        ...
+    magicpy.puzzle.basic.IllegalOperationError: 0.1
+    >>> PhysicalOperation.shutdown_frame_pool()
+
+    "adaptive" sweep gives the same verdicts with fewer frames:
+
+    >>> roll = SymbolicPartitionalOperation({Halfspace(0, k): rotate(2*pi, i),
+    ...                                      Halfspace(0,-k): identity()}).interpret_for(pzl)
+    >>> turn.sweep = flip.sweep = roll.sweep = "adaptive"
+    >>> turn.check_motion(pzl)
+    2
+    >>> flip.check_motion(pzl)
+    Traceback (most recent call last):
+        ...
+    magicpy.puzzle.basic.IllegalOperationError: 1.0
+    >>> roll.check_motion(pzl)
+    Traceback (most recent call last):
+        ...
+    magicpy.puzzle.basic.IllegalOperationError: 0.5
+    """
+    workers = None
+    # process pool shared by all sweeps, created lazily
+    _pool = None
+    _pool_workers = None
+    _sweep_ids = count()
+
+    @classmethod
+    def frame_pool(cls, workers):
+        """
+        process pool of `workers` processes for frame validation, which is
+        kept until `shutdown_frame_pool`.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        pool = PhysicalOperation._pool
+        if pool is None or PhysicalOperation._pool_workers != workers:
+            cls.shutdown_frame_pool()
+            pool = PhysicalOperation._pool = ProcessPoolExecutor(max_workers=workers)
+            PhysicalOperation._pool_workers = workers
+        return pool
+
+    @classmethod
+    def shutdown_frame_pool(cls):
+        if PhysicalOperation._pool is not None:
+            PhysicalOperation._pool.shutdown(wait=True)
+            PhysicalOperation._pool = None
+            PhysicalOperation._pool_workers = None
+
     def apply(self, pzl):
         if not isinstance(self, pzl.elementary_operation_type):
             raise IllegalOperationError
         if not pzl.is_valid_elementary_operation(self):
             raise IllegalOperationError
 
-        ops = []
-        elems = []
-        inds = sorted(range(len(self)), key=lambda i: hash(self[i]))
-        for op_i, inds_i in groupby(inds, self.__getitem__):
-            ops.append(op_i)
-            elems.append(pzl.engine.fuse(map(pzl.__getitem__, inds_i)))
-        fused_op = self.new(ops)
-        fused_pzl = pzl.new(elems)
-
-        for t in range(int(fused_op.distance*fused_op.density)+1):
-            moved = fused_op.to(t/fused_op.density).transform(fused_pzl)
-            if not moved.is_valid_state():
-                raise IllegalOperationError
+        self.record_sweep(self.check_motion(pzl))
 
         pzl = self.transform(pzl)
         if not pzl.is_valid_state():
@@ -61,11 +164,162 @@ class PhysicalOperation(ContinuousCombinationalOperation):
 
         return pzl
 
+    def action_is_identity(self, act):
+        """
+        whether action `act` keeps element still all the time.
+        """
+        return isinstance(act, IdentityPath)
+
+    def split_by_motion(self, pzl):
+        """
+        fuse elements of `pzl` by their actions, and separate moving groups
+        from stationary one.
+        return actions of moving groups, fused elements of moving groups and
+        fused stationary element (None if there is no stationary element).
+        """
+        ops = []
+        elems = []
+        still = []
+        inds = sorted(range(len(self)), key=lambda i: hash(self[i]))
+        for op_i, inds_i in groupby(inds, self.__getitem__):
+            elems_i = list(map(pzl.__getitem__, inds_i))
+            if self.action_is_identity(op_i):
+                still.extend(elems_i)
+            else:
+                ops.append(op_i)
+                elems.append(pzl.engine.fuse(elems_i))
+        still = pzl.engine.fuse(still) if still else None
+        return ops, elems, still
+
+    def is_valid_frame(self, moved, still):
+        """
+        check collision of moving groups `moved` with each other and with
+        stationary element `still`.  rigid motion keeps the validity of each
+        element, so only collision is checked.
+        """
+        objs = list(moved) if still is None else list(moved)+[still]
+        return moved.engine.no_collision(objs)
+
+    def check_motion(self, pzl):
+        """
+        check collision along this operation, and return the number of
+        checked frames.
+        """
+        ops, elems, still = self.split_by_motion(pzl)
+        if len(ops) == 0 or len(ops) == 1 and still is None:
+            return 0
+        moving_op = self.new(ops)
+        moving_pzl = pzl.new(elems)
+        engine = pzl.engine
+
+        if self.sweep != "adaptive" and self.workers:
+            return self._parallel_sweep(moving_op, moving_pzl, still)
+
+        if self.sweep != "adaptive":
+            def is_valid_at(dis):
+                moved = moving_op.to(dis).transform(moving_pzl)
+                return self.is_valid_frame(moved, still)
+            return self.sweep_frames(is_valid_at)
+
+        # evaluated frames, and radii and axes of moving groups
+        frames = {}
+        radii = [bound_radius(bd) if bd is not None else None
+                 for bd in map(engine.bound_of, moving_pzl)]
+        axes = list(map(self.action_axis, ops))
+
+        def is_valid_at(dis):
+            moved = moving_op.to(dis).transform(moving_pzl)
+            frames[dis] = moved
+            return self.is_valid_frame(moved, still)
+
+        def is_free_between(dis1, dis2):
+            disps = [self.displacement_bound(act, dis1, dis2, radius) if radius is not None else None
+                     for act, radius in zip(ops, radii)]
+            return self.is_swept_free(engine, frames[dis1], frames[dis2], still, disps, axes)
+
+        return self.sweep_frames(is_valid_at, is_free_between)
+
+    def _parallel_sweep(self, moving_op, moving_pzl, still):
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        frames = int(moving_op.distance*moving_op.density)+1
+        diss = [t/moving_op.density for t in range(frames)]
+        pool = self.frame_pool(self.workers)
+        key = next(PhysicalOperation._sweep_ids)
+        data = pickle.dumps((self, moving_op, moving_pzl, still), -1)
+        pending = {pool.submit(_validate_frame, key, data, dis): dis for dis in diss}
+        failed = None
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dis = pending.pop(future)
+                    if not future.result() and (failed is None or dis < failed):
+                        failed = dis
+                if failed is not None:
+                    # frames after the first collision are unnecessary
+                    for future, dis in list(pending.items()):
+                        if dis > failed and future.cancel():
+                            del pending[future]
+        finally:
+            for future in pending:
+                future.cancel()
+
+        if failed is not None:
+            raise IllegalOperationError(failed)
+        return frames
+
+    def displacement_bound(self, act, dis1, dis2, radius):
+        """
+        upper bound of displacement of points within `radius` from origin
+        under action `act` between distance `dis1` and `dis2`, or None if
+        unknown.
+        """
+        return None
+
+    def action_axis(self, act):
+        """
+        unit vector which displacements under action `act` are always
+        perpendicular to, such as the axis of rotation, or None if unknown.
+        """
+        return None
+
+    def is_swept_free(self, engine, moved1, moved2, still, disps, axes):
+        """
+        whether moving groups, which are `moved1` and `moved2` at the ends of
+        an interval and whose points move at most `disps` (perpendicular to
+        `axes`) in it, never touch each other and stationary element `still`.
+        the swept region is bounded by dilating the frames at the ends by
+        `engine.is_swept_outside`, so face turn touching the stationary
+        element can be skipped.
+        """
+        if None in disps:
+            return False
+        if still is not None:
+            # each point of a path is within half of its length from one of
+            # the ends
+            for obj1, obj2, disp, axis in zip(moved1, moved2, disps, axes):
+                if not engine.is_swept_outside([obj1, obj2], disp/2, still, axis):
+                    return False
+        for i, j in combinations(range(len(disps)), 2):
+            # `disps[i]` is bounded by the radius of group `i` itself; if the
+            # groups meet in the interval, the meeting point is within
+            # `disps[i]` of group `i` and within `disps[j]` of group `j` at
+            # the start, so dilating one by the sum touches the other
+            axis = axes[i] if axes[i] is not None and axes[i] == axes[j] else None
+            if not engine.is_swept_outside([moved1[i]], disps[i]+disps[j], moved1[j], axis):
+                return False
+        return True
+
+atexit.register(PhysicalOperation.shutdown_frame_pool)
+
 class PartitionalOperation(SelectiveOperation):
     interpreted_type = PhysicalOperation
 
 
-sym_engine = SymbolicSolidEngineVolumeAlgo(cube_engine())
+# rasters of physical puzzles are packed words, which are fixed-size and need
+# no masking for complement
+sym_engine = SymbolicSolidEngineVolumeAlgo(cube_engine(engine_type=PackedVoxelEngine))
 
 class SymbolicPhysicalPuzzle(PhysicalPuzzle):
     def __new__(cls, elems, states=T_RR3, actions=SE3_star):
@@ -92,6 +346,30 @@ class SymbolicPhysicalPuzzle(PhysicalPuzzle):
     def simplify(self):
         return self.new(self.engine.simplify(self))
 
+    def simplified_cross_common(self, cols, workers=None):
+        """
+        same as `cross_common(cols).simplify()`, but cells are generated and
+        simplified one by one (by process pool with `workers` processes if
+        set), so the unsimplified cells are never kept at once.
+
+        >>> from symplus.euclid import Box, Halfspace
+        >>> from symplus.matplus import i, j, k
+        >>> pzl = SymbolicPhysicalPuzzle([Box()])
+        >>> cols = [(Halfspace(0.5, d), Halfspace(-0.5, -d)) for d in (i, j, k)]
+        >>> cols[2] = (Halfspace(2, k), Halfspace(-2, -k))
+        >>> full = pzl.cross_common(cols).simplify()
+        >>> len(pzl.cross_common(cols)), len(full)
+        (8, 4)
+        >>> pzl.simplified_cross_common(cols) == full
+        True
+        >>> sigs = lambda pzl: list(map(pzl.elem_signature, pzl))
+        >>> sigs(pzl.simplified_cross_common(cols, workers=2)) == sigs(full)
+        True
+        """
+        # empty cells are dropped anyway, so prune them early
+        cells = self.iter_cross_common(cols, prune=True)
+        return self.new(self.engine.iter_simplify(cells, workers=workers))
+
     def __str__(self):
         elemstr = ',\n     '.join(map(mstr, self))
         return '%s(\n    [%s],\n    %s, %s)'%(type(self).__name__,
@@ -102,6 +380,56 @@ class SymbolicPhysicalPuzzle(PhysicalPuzzle):
     def __repr__(self):
         return self.__str__()
 
+@lru_cache(maxsize=128)
+def path_axis(act):
+    """
+    unit axis of euclidean transformation path as tuple of floats, if it is
+    rotation about fixed axis without translation along time, which moves
+    points perpendicular to the axis; otherwise None.
+    """
+    if not isinstance(act, TransformationPath) or not isinstance(act.expr, EuclideanTransformation):
+        return None
+    t = act.variable
+    if any(simplify(v) != 0 for v in act.expr.tvec.diff(t)):
+        return None
+    vec = act.expr.rquat[1:,:]
+    if any(simplify(v) != 0 for v in vec.cross(vec.diff(t))):
+        return None
+    axis = [float(v) for v in vec.subs(t, act.length)]
+    norm = sum(v**2 for v in axis)**0.5
+    if norm == 0:
+        return None
+    return tuple(v/norm for v in axis)
+
+@lru_cache(maxsize=128)
+def path_speed(act):
+    """
+    upper bounds of linear and angular speed of euclidean transformation path
+    over its whole length as floats, or None if unknown.
+
+    >>> from sympy import pi
+    >>> from symplus.affine import rotate
+    >>> [round(v, 6) for v in path_speed(rotate(pi/2, [0,0,1]))]
+    [0.0, 1.570796]
+    """
+    if not isinstance(act, TransformationPath) or not isinstance(act.expr, EuclideanTransformation):
+        return None
+    # real parameter, so that norms are simplified without `Abs`
+    t = Dummy("t", real=True)
+    tvec = act.expr.tvec.subs(act.variable, t)
+    rquat = act.expr.rquat.subs(act.variable, t)
+    lin = simplify(sqrt(sum(v**2 for v in tvec.diff(t))))
+    ang = simplify(2*sqrt(sum(v**2 for v in rquat.diff(t))))
+    bounds = []
+    for speed in (lin, ang):
+        try:
+            if t in speed.free_symbols:
+                speed = maximum(speed, t, Interval(0, act.length))
+            bounds.append(float(speed))
+        except (TypeError, ValueError, NotImplementedError):
+            return None
+    return tuple(bounds)
+
 class SymbolicPhysicalOperation(PhysicalOperation):
     @property
     def engine(self):
@@ -113,14 +441,31 @@ class SymbolicPhysicalOperation(PhysicalOperation):
     def action_to(self, act, dis):
         return act[:dis]
 
+    def action_is_identity(self, act):
+        return (isinstance(act, IdentityPath) or
+                isinstance(act, TransformationPath) and act.expr == EuclideanTransformation())
+
+    def action_axis(self, act):
+        return path_axis(act)
+
+    def displacement_bound(self, act, dis1, dis2, radius):
+        # point at distance r from origin moves with speed at most
+        # lin + r*ang, which are bounded over the whole path
+        speed = path_speed(act)
+        if speed is None:
+            return None
+        lin, ang = speed
+        return (lin + radius*ang) * (dis2-dis1)
+
     def elem_transform(self, elem, action):
         if isinstance(action, IdentityPath):
             return elem
         else:
-            return self.engine.transform([elem], action.call())[0]
+            return self.engine.transform([elem], action.forget())[0]
 
 class SymbolicPartitionalOperation(PartitionalOperation):
     interpreted_type = SymbolicPhysicalOperation
+    selection_key = staticmethod(default_sort_key)
 
     @property
     def engine(self):
@@ -0,0 +1,390 @@
+"""
+this module provide tools for exploring state space of puzzle.
+states are identified by `fingerprint`, which is the same for physically
+identical states reached by different routes.
+"""
+import os, json, time, pickle, struct
+from collections import namedtuple
+from magicpy.puzzle.basic import IllegalOperationError, IllegalStateError
+from magicpy.util import LRUCache
+
+
+class TranspositionTable(object):
+    """
+    bounded table of visited states keyed by `fingerprint`, which records the
+    least depth where the state was reached.  the least recently visited
+    states are evicted when it is full.
+
+    >>> table = TranspositionTable(maxsize=2)
+    >>> table.visit(b'a', 3), table.visit(b'a', 4), table.visit(b'a', 2)
+    (True, False, True)
+    >>> table.depth_of(b'a')
+    2
+    >>> table.visit(b'b', 0), table.visit(b'c', 0), b'a' in table
+    (True, True, False)
+    """
+    def __init__(self, maxsize=1<<20):
+        self.cache = LRUCache(maxsize)
+
+    def visit(self, key, depth=0):
+        """
+        record state `key` reached at `depth`.  return False if it was already
+        reached at depth not greater than `depth`, that is, it need not be
+        explored again.
+        """
+        known = self.cache.get(key)
+        if known is not None and known <= depth:
+            return False
+        self.cache[key] = depth
+        return True
+
+    def depth_of(self, key):
+        return self.cache.get(key)
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def __len__(self):
+        return len(self.cache)
+
+    def clear(self):
+        self.cache.clear()
+
+    def info(self):
+        return self.cache.info()
+
+
+class VisitedSet(object):
+    """
+    set of fixed-width keys (such as `fingerprint`), which are kept in memory
+    until `maxmem` keys, then spilled to sorted memory-mapped files in
+    `directory`.  each spill appends new sorted run `visited-<version>.keys`,
+    and the last two runs are merged while the older one is not larger than
+    twice the newer one, so each key is rewritten only logarithmically many
+    times.  replaced runs are still valid until they are removed by
+    `discard_files`.  the width of keys is taken from the first key if not
+    given, and keys of other width are rejected.
+
+    >>> import tempfile
+    >>> visited = VisitedSet(tempfile.mkdtemp(), maxmem=2)
+    >>> visited.add(b'ab'), visited.add(b'cd'), visited.add(b'ab')
+    (True, True, False)
+    >>> visited.full
+    True
+    >>> visited.spill(), visited.names
+    ([], ['visited-0.keys'])
+    >>> visited.add(b'ab'), visited.add(b'ef'), visited.add(b'a\\0'), len(visited)
+    (False, True, True, 4)
+    >>> visited.spill(), visited.names
+    (['visited-0.keys', 'visited-1.keys'], ['visited-2.keys'])
+    >>> b'a\\0' in visited, b'a' in visited, b'gh' in visited
+    (True, False, False)
+    >>> visited.add(b'abc')
+    Traceback (most recent call last):
+        ...
+    ValueError: key of width 3 is not of width 2
+    """
+    def __init__(self, directory, width=None, maxmem=1<<20, names=()):
+        self.directory = directory
+        self.width = width
+        self.maxmem = maxmem
+        self.names = []
+        self._mem = set()
+        self._runs = []
+        self.load(names)
+
+    @property
+    def dtype(self):
+        return "S%d"%self.width
+
+    def _version(self, name):
+        return int(name.split("-")[1].split(".")[0])
+
+    def _open(self, name):
+        import numpy
+        return numpy.memmap(os.path.join(self.directory, name), dtype=self.dtype, mode="r")
+
+    def load(self, names):
+        self.names = list(names)
+        self._runs = list(map(self._open, self.names))
+
+    def __contains__(self, key):
+        if len(key) != self.width:
+            return False
+        if key in self._mem:
+            return True
+        import numpy
+        # items of bytes array drop trailing null bytes
+        key_ = key.rstrip(b"\0")
+        for run in self._runs:
+            i = numpy.searchsorted(run, key)
+            if i < len(run) and run[i] == key_:
+                return True
+        return False
+
+    def add(self, key):
+        """
+        add `key`, and return False if it is already in this set.
+        """
+        if self.width is None:
+            self.width = len(key)
+        elif len(key) != self.width:
+            raise ValueError("key of width %d is not of width %d"%(len(key), self.width))
+        if key in self:
+            return False
+        self._mem.add(key)
+        return True
+
+    @property
+    def full(self):
+        return len(self._mem) >= self.maxmem
+
+    def __len__(self):
+        return len(self._mem) + sum(map(len, self._runs))
+
+    def _new_path(self):
+        version = max(map(self._version, self.names))+1 if self.names else 0
+        name = "visited-%d.keys"%version
+        return name, os.path.join(self.directory, name)
+
+    def spill(self, chunk=1<<20):
+        """
+        write keys in memory to new sorted run, merge runs if needed, and
+        return the names of replaced runs.
+        """
+        import numpy
+        if not self._mem:
+            return []
+
+        name, path = self._new_path()
+        mem = numpy.array(sorted(self._mem), dtype=self.dtype)
+        out = numpy.memmap(path, dtype=self.dtype, mode="w+", shape=(len(mem),))
+        out[:] = mem
+        out.flush()
+        del out
+        self._mem = set()
+        self.names.append(name)
+        self._runs.append(self._open(name))
+
+        replaced = []
+        while len(self._runs) >= 2 and len(self._runs[-2]) <= 2*len(self._runs[-1]):
+            old, new = self._runs[-2:]
+            name, path = self._new_path()
+            # runs are disjoint, so the position of each key in the merged
+            # array is its rank in the other run plus its index
+            out = numpy.memmap(path, dtype=self.dtype, mode="w+", shape=(len(old)+len(new),))
+            for run, other in ((old, new), (new, old)):
+                for n in range(0, len(run), chunk):
+                    part = run[n:n+chunk]
+                    out[numpy.searchsorted(other, part) + numpy.arange(n, n+len(part))] = part
+            out.flush()
+            del out
+            replaced.extend(self.names[-2:])
+            self.load(self.names[:-2] + [name])
+        return replaced
+
+    def discard_files(self, names):
+        for name in names:
+            if name not in self.names:
+                os.remove(os.path.join(self.directory, name))
+
+
+ExplorerStats = namedtuple("ExplorerStats", ["depth", "expanded", "generated",
+    "duplicates", "illegal", "frontier", "visited", "elapsed"])
+
+class Explorer(object):
+    """
+    breadth-first explorer of states reachable from `start` by applying
+    operations `ops`, whose files are stored in `directory`.
+
+    states are deduplicated by `key` (`fingerprint` by default) in
+    `VisitedSet`, and frontiers of each depth are written to files by `encode`
+    and read by `decode` (`pickle` by default).  the progress is saved to
+    checkpoint every `checkpoint_every` expanded states and at the end of
+    each depth and when it stops, and new explorer in the same directory
+    resumes from it, where states found after the last checkpoint are found
+    again.  `report` is called with `ExplorerStats` at each checkpoint.
+    keys must be of the same length, which is the width of `VisitedSet`.
+
+    >>> import tempfile
+    >>> from magicpy.museum.FifteenPuzzle import pzl, up, down, left, right
+    >>> explorer = Explorer(pzl, [up, down, left, right], tempfile.mkdtemp())
+    >>> stats = explorer.run(max_depth=4)
+    >>> explorer.level_sizes
+    [1, 2, 4, 10, 24]
+    >>> stats.visited, stats.illegal
+    (41, 0)
+    >>> Explorer(pzl, [up, down, left, right], explorer.directory).run(max_depth=5).visited
+    95
+    """
+    checkpoint_name = "checkpoint.json"
+
+    def __init__(self, start, ops, directory, maxmem=1<<20, checkpoint_every=100000,
+                 key=None, encode=None, decode=None, report=None):
+        self.start = start
+        self.ops = tuple(ops)
+        self.directory = directory
+        self.maxmem = maxmem
+        self.checkpoint_every = checkpoint_every
+        self.key = key if key is not None else (lambda pzl: pzl.fingerprint())
+        self.encode = encode if encode is not None else (lambda pzl: pickle.dumps(pzl, -1))
+        self.decode = decode if decode is not None else pickle.loads
+        self.report = report
+
+    def _frontier_path(self, depth):
+        return os.path.join(self.directory, "frontier-%d.bin"%depth)
+
+    def _write(self, file, pzl):
+        data = self.encode(pzl)
+        file.write(struct.pack("<I", len(data)))
+        file.write(data)
+
+    def _read(self, file):
+        head = file.read(4)
+        if len(head) < 4:
+            return None
+        size, = struct.unpack("<I", head)
+        return self.decode(file.read(size))
+
+    def _reset(self):
+        self.depth = 0
+        self.offset = 0
+        self.next_size = 0
+        self.counters = dict(expanded=0, generated=0, duplicates=0, illegal=0)
+        self.level_sizes = [1]
+        self.elapsed = 0.0
+
+        self.visited = VisitedSet(self.directory, maxmem=self.maxmem)
+        self.visited.add(self.key(self.start))
+        with open(self._frontier_path(0), "wb") as file:
+            self._write(file, self.start)
+        open(self._frontier_path(1), "wb").close()
+        self._checkpoint()
+
+    def _resume(self):
+        with open(os.path.join(self.directory, self.checkpoint_name)) as file:
+            data = json.load(file)
+        self.depth = data["depth"]
+        self.offset = data["offset"]
+        self.next_size = data["next_size"]
+        self.counters = data["counters"]
+        self.level_sizes = data["level_sizes"]
+        self.elapsed = data["elapsed"]
+        self.visited = VisitedSet(self.directory, width=data["width"], maxmem=self.maxmem,
+                                  names=data["visited"])
+        # drop states found after the checkpoint
+        with open(self._frontier_path(self.depth+1), "r+b") as file:
+            file.truncate(self.next_size)
+        # the previous frontier is left if it crashed before removing it
+        if self.depth > 0 and os.path.exists(self._frontier_path(self.depth-1)):
+            os.remove(self._frontier_path(self.depth-1))
+
+    def _checkpoint(self, next_file=None):
+        if next_file is not None:
+            next_file.flush()
+            os.fsync(next_file.fileno())
+        replaced = self.visited.spill()
+        data = dict(depth=self.depth, offset=self.offset, next_size=self.next_size,
+                    counters=self.counters, level_sizes=self.level_sizes,
+                    elapsed=self.elapsed, visited=self.visited.names,
+                    width=self.visited.width)
+        path = os.path.join(self.directory, self.checkpoint_name)
+        with open(path+".tmp", "w") as file:
+            json.dump(data, file)
+        os.replace(path+".tmp", path)
+        self.visited.discard_files(replaced)
+        if self.report is not None:
+            self.report(self.stats)
+
+    @property
+    def stats(self):
+        return ExplorerStats(depth=self.depth, frontier=self.level_sizes[-1],
+                             visited=len(self.visited), elapsed=self.elapsed,
+                             **self.counters)
+
+    def neighbors(self, pzl):
+        """
+        generate states reached from `pzl` by applying each operation, where
+        illegal operations are counted and skipped.
+        """
+        for op in self.ops:
+            try:
+                yield op.apply(pzl)
+            except (IllegalOperationError, IllegalStateError):
+                self.counters["illegal"] += 1
+
+    def explore(self, max_depth=None, max_states=None):
+        """
+        generate `(depth, state)` of newly found states, until depth
+        `max_depth` or `max_states` states are found.
+        """
+        if os.path.exists(os.path.join(self.directory, self.checkpoint_name)):
+            self._resume()
+        else:
+            self._reset()
+            yield 0, self.start
+
+        start_time = time.time() - self.elapsed
+        while max_depth is None or self.depth < max_depth:
+            if len(self.level_sizes) == self.depth+1:
+                self.level_sizes.append(0)
+
+            with open(self._frontier_path(self.depth), "rb") as curr, \
+                 open(self._frontier_path(self.depth+1), "ab") as next_:
+                curr.seek(self.offset)
+                since = 0
+                while True:
+                    pos = curr.tell()
+                    pzl = self._read(curr)
+                    if pzl is None:
+                        break
+                    self.counters["expanded"] += 1
+                    for moved in self.neighbors(pzl):
+                        self.counters["generated"] += 1
+                        if not self.visited.add(self.key(moved)):
+                            self.counters["duplicates"] += 1
+                            continue
+                        self._write(next_, moved)
+                        self.level_sizes[-1] += 1
+                        yield self.depth+1, moved
+                        if max_states is not None and len(self.visited) >= max_states:
+                            # resume from this state, whose found neighbors
+                            # are already visited
+                            self.offset = pos
+                            self.next_size = next_.tell()
+                            self.elapsed = time.time() - start_time
+                            self._checkpoint(next_)
+                            return
+
+                    since += 1
+                    if since >= self.checkpoint_every or self.visited.full:
+                        self.offset = curr.tell()
+                        self.next_size = next_.tell()
+                        self.elapsed = time.time() - start_time
+                        self._checkpoint(next_)
+                        since = 0
+
+            if self.level_sizes[-1] == 0:
+                self.level_sizes.pop()
+                self.offset = os.path.getsize(self._frontier_path(self.depth))
+                self.elapsed = time.time() - start_time
+                self._checkpoint()
+                return
+
+            # next depth; the old frontier is removed only after the
+            # checkpoint no longer refers to it
+            self.depth += 1
+            self.offset = 0
+            self.next_size = 0
+            open(self._frontier_path(self.depth+1), "wb").close()
+            self.elapsed = time.time() - start_time
+            self._checkpoint()
+            os.remove(self._frontier_path(self.depth-1))
+
+    def run(self, max_depth=None, max_states=None):
+        """
+        explore all states, and return `ExplorerStats`.
+        """
+        for _ in self.explore(max_depth=max_depth, max_states=max_states):
+            pass
+        return self.stats
@@ -1,3 +1,4 @@
+from math import sqrt
 from itertools import combinations, product, starmap
 from sympy.sets import Intersection, Union
 from symplus.setplus import Image, AbsoluteComplement
@@ -5,7 +6,41 @@ from symplus.path import IdentityPath
 from magicpy.util import map, filterfalse
 
 
+def bound_common(bd1, bd2):
+    """
+    bounding box of intersection of two bounding boxes, where None is
+    unbounded.
+    """
+    if bd1 is None:
+        return bd2
+    if bd2 is None:
+        return bd1
+    n = min(len(bd1), len(bd2))
+    common = tuple((max(lo1, lo2), min(hi1, hi2))
+                   for (lo1, hi1), (lo2, hi2) in zip(bd1[:n], bd2[:n]))
+    return common + tuple(bd1[n:]) + tuple(bd2[n:])
+
+def bound_radius(bd, dim=3):
+    """
+    upper bound of distance from origin to points in bounding box, or None if
+    the bounding box does not cover all axes.
+    """
+    if len(bd) < dim:
+        return None
+    if any(lo > hi for lo, hi in bd):
+        return 0.0
+    return sqrt(sum(max(lo**2, hi**2) for lo, hi in bd))
+
+
 class SolidEngine(object):
+    # statistics of broad phase of `no_collision`
+    checked_pairs = 0
+    culled_pairs = 0
+    # build cells of `cross_common` cut by cut, and drop empty cells before the
+    # next cut, which omits empty cells from the result; `partition` always
+    # prunes, since its empty cells are never pieces
+    prune_cells = False
+
     def is_null(self, obj):
         raise NotImplementedError
 
@@ -36,7 +71,73 @@ class SolidEngine(object):
         return groups, remaining
 
     def no_collision(self, objs):
-        return all(starmap(self.is_outside, combinations(tuple(objs), 2)))
+        objs = tuple(objs)
+        pairs = self.overlapping_pairs(objs)
+        self.checked_pairs += len(pairs)
+        self.culled_pairs += len(objs)*(len(objs)-1)//2 - len(pairs)
+        return all(self.is_outside(objs[i], objs[j]) for i, j in pairs)
+
+    def bound_of(self, obj):
+        """
+        axis-aligned bounding box of `obj`, as tuple of `(lo, hi)` for leading
+        axes (may be fewer than the dimension), or None if unbounded/unknown.
+        """
+        return None
+
+    def is_swept_outside(self, objs, radius, reg, axis=None):
+        """
+        True if points within `radius` of `objs` are outside `reg`, where only
+        offsets perpendicular to unit vector `axis` are considered if given.
+        it bounds the region swept by objects moving at most `radius`; False
+        means unknown.
+        """
+        return False
+
+    def signature_of(self, obj):
+        """
+        canonical bytes of `obj`, which are the same for the same solid, no
+        matter how it is expressed.
+        """
+        raise NotImplementedError
+
+    def overlapping_pairs(self, objs):
+        """
+        pairs of indices of `objs` whose bounding boxes overlap, by sweep and
+        prune along the first axis.  objects without bound overlap everything.
+
+        >>> from itertools import combinations
+        >>> from symplus.euclid import Sphere
+        >>> from magicpy.solid.marching import cube_engine, PackedVoxelEngine
+        >>> engine = cube_engine(2.0, 5, PackedVoxelEngine)
+        >>> centers = [[-1,-1,0], [0,0,0], [0.6,0,0], [0.6,0.6,0], [1,1,1], [-1,1,-1]]
+        >>> objs = [engine.construct(Sphere(0.5, c)) for c in centers]
+        >>> sorted(engine.overlapping_pairs(objs))
+        [(1, 2), (1, 3), (2, 3)]
+        >>> [(i, j) for i, j in combinations(range(len(objs)), 2)
+        ...  if not engine.is_outside(objs[i], objs[j])]
+        [(1, 2), (1, 3), (2, 3)]
+        >>> engine.no_collision(objs), engine.no_collision(objs[:2]+objs[4:])
+        (False, True)
+        >>> engine.checked_pairs, engine.culled_pairs
+        (3, 18)
+        """
+        bounds = [self.bound_of(obj) for obj in objs]
+        unbounded = [i for i, bd in enumerate(bounds) if bd is None]
+        bounded = sorted((i for i, bd in enumerate(bounds) if bd is not None),
+                         key=lambda i: bounds[i][0][0])
+
+        pairs = [tuple(sorted(ij)) for ij in combinations(unbounded, 2)]
+        pairs.extend((min(i, j), max(i, j)) for i in unbounded for j in bounded)
+        active = []
+        for j in bounded:
+            lo = bounds[j][0][0]
+            active = [i for i in active if bounds[i][0][1] >= lo]
+            for i in active:
+                if all(lo1 <= hi2 and lo2 <= hi1
+                       for (lo1, hi1), (lo2, hi2) in zip(bounds[i], bounds[j])):
+                    pairs.append((min(i, j), max(i, j)))
+            active.append(j)
+        return pairs
 
     def no_cross_collision(self, cols):
         return all(map(self.no_collision, product(*map(tuple, cols))))
@@ -45,7 +146,70 @@ class SolidEngine(object):
         raise NotImplementedError
 
     def cross_common(self, cols):
-        return tuple(map(self.common, product(*map(tuple, cols))))
+        return tuple(self.iter_cross_common(cols))
+
+    def iter_cross_common(self, cols, prune=None):
+        """
+        generate commons of product of `cols` lazily, in the order of
+        `product`.  if `prune` (default `prune_cells`) is set, cells are cut
+        depth first, and cells found empty are skipped with all their
+        subcells, so only one partial cell per column is kept in memory.
+
+        >>> from symplus.euclid import Box, Halfspace
+        >>> from symplus.matplus import i, j
+        >>> from magicpy.solid.marching import cube_engine
+        >>> engine = cube_engine(2.0, 5)
+        >>> cols = [(engine.construct(Box()),)] + [
+        ...     (engine.construct(Halfspace(o, d)), engine.construct(Halfspace(-o, -d)))
+        ...     for d in (i, j) for o in (-0.5, 0.5)]
+        >>> full = engine.cross_common(cols)
+        >>> len(full)
+        16
+        >>> pruned = tuple(engine.iter_cross_common(cols, prune=True))
+        >>> (list(map(engine.signature_of, pruned)) ==
+        ...  [engine.signature_of(obj) for obj in full if not engine.is_null(obj)])
+        True
+        >>> len(pruned)
+        9
+        """
+        cols = list(map(tuple, cols))
+        if prune is None:
+            prune = self.prune_cells
+        if not prune or not cols:
+            for objs in product(*cols):
+                yield self.common(objs)
+            return
+
+        stack = [((), None, iter(cols[0]))]
+        while stack:
+            objs, data, col = stack[-1]
+            obj = next(col, _end)
+            if obj is _end:
+                stack.pop()
+                continue
+            data_ = self._cell_start(obj) if not objs else self._cell_extend(data, obj)
+            if self._cell_is_null(data_):
+                continue
+            if len(objs)+1 == len(cols):
+                yield self.common(objs+(obj,))
+            else:
+                stack.append((objs+(obj,), data_, iter(cols[len(objs)+1])))
+
+    def _cell_start(self, obj):
+        """
+        data of cell cut by `obj` only, which is used to tell if the cell is
+        empty.
+        """
+        return obj
+
+    def _cell_extend(self, data, obj):
+        """
+        data of cell further cut by `obj`.
+        """
+        return self.common([data, obj])
+
+    def _cell_is_null(self, data):
+        return self.is_null(data)
 
     def fuse(self, objs):
         raise NotImplementedError
@@ -66,12 +230,29 @@ class SolidEngine(object):
         return self.common([obj1, self.complement(obj2)])
 
     def partition(self, *objs):
+        """
+        non-empty cells cut by `objs` and their complements.
+
+        >>> from symplus.euclid import Halfspace
+        >>> from symplus.matplus import i
+        >>> from magicpy.solid.marching import cube_engine
+        >>> engine = cube_engine(2.0, 5)
+        >>> len(engine.partition(engine.construct(Halfspace(0.5, i)),
+        ...                      engine.construct(Halfspace(-0.5, -i))))
+        3
+        """
+        return tuple(self.iter_partition(*objs))
+
+    def iter_partition(self, *objs):
         knives = zip(objs, map(self.complement, objs))
-        return tuple(map(self.common, product(*knives)))
+        return self.iter_cross_common(knives, prune=True)
 
     def partition_by(self, col, *objs):
+        return tuple(self.iter_partition_by(col, *objs))
+
+    def iter_partition_by(self, col, *objs):
         knives = zip(objs, map(self.complement, objs))
-        return tuple(map(self.common, product(col, *knives)))
+        return self.iter_cross_common([col] + list(knives), prune=True)
 
     def transform(self, col, *transs):
         raise NotImplementedError
@@ -82,6 +263,56 @@ class SolidEngine(object):
     def simplify(self, col):
         return tuple(filterfalse(self.is_null, map(self.simp, col)))
 
+    def iter_simplify(self, col, workers=None):
+        """
+        generate simplified non-empty objects of `col` lazily, in order.
+        objects are simplified by process pool with `workers` processes if
+        `workers` is set, where at most `2*workers` objects are in progress.
+        """
+        if not workers:
+            for obj in filterfalse(self.is_null, map(self.simp, col)):
+                yield obj
+            return
+
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(max_workers=workers,
+                                   initializer=_init_simp_context,
+                                   initargs=(self,))
+        try:
+            pending = deque()
+            for obj in col:
+                pending.append(pool.submit(_simp_obj, obj))
+                if len(pending) >= 2*workers:
+                    obj, null = pending.popleft().result()
+                    if not null:
+                        yield obj
+            while pending:
+                obj, null = pending.popleft().result()
+                if not null:
+                    yield obj
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+
+# end of column in `iter_cross_common`, since any object may be element
+_end = object()
+
+# engine of simplification in worker process, which is set once by the
+# initializer of pool
+_simp_engine = None
+
+def _init_simp_context(engine):
+    global _simp_engine
+    _simp_engine = engine
+
+def _simp_obj(obj):
+    obj = _simp_engine.simp(obj)
+    return obj, _simp_engine.is_null(obj)
+
 
 class SolidDisplayer(object):
     def show(self, document):
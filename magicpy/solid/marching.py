@@ -4,7 +4,7 @@ from operator import and_, or_
 from sympy.core.compatibility import lru_cache
 from sympy.sets import Set, Intersection, Union, Complement
 from sympy.utilities import lambdify
-from symplus.setplus import AbstractSet, as_abstract, AbsoluteComplement
+from symplus.setplus import AbstractSet, as_abstract, as_predicate, bounding_box, AbsoluteComplement
 from magicpy.solid.general import SolidEngine
 from magicpy.util import map, range
 
@@ -24,6 +24,13 @@ def bitcount(bits):
     else:
         return bin(bits).count("1")
 
+def popcount(words):
+    import numpy
+    if hasattr(numpy, "bitwise_count"):
+        return int(numpy.bitwise_count(words).sum())
+    table = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint8)
+    return int(table[words.view(numpy.uint8)].sum(dtype=numpy.int64))
+
 def bitmap(func, voxels):
     bits = 0
     t = 1
@@ -33,12 +40,46 @@ def bitmap(func, voxels):
         t <<= 1
     return bits
 
+def bitbound(bits, size):
+    """
+    ranges of indices along each axis of nonzero bits `bits` of cube grid with
+    `size` points per axis, ordered with x outermost as `CubeVoxels`.  x-range
+    is given by the lowest and highest bits, and the others by folding slabs
+    with word-level operations, so bits are never unpacked.
+
+    >>> bitbound(0b000010000000100000, 3)
+    ((0, 1), (1, 1), (1, 2))
+    """
+    m = size*size
+    xlo = ((bits & -bits).bit_length()-1)//m
+    xhi = (bits.bit_length()-1)//m
+    slab = (1<<m)-1
+    bits >>= xlo*m
+    yz = 0
+    for _ in range(xhi-xlo+1):
+        yz |= bits & slab
+        bits >>= m
+
+    ylo = ((yz & -yz).bit_length()-1)//size
+    yhi = (yz.bit_length()-1)//size
+    row = (1<<size)-1
+    yz >>= ylo*size
+    z = 0
+    for _ in range(yhi-ylo+1):
+        z |= yz & row
+        yz >>= size
+
+    zlo = (z & -z).bit_length()-1
+    zhi = z.bit_length()-1
+    return ((xlo, xhi), (ylo, yhi), (zlo, zhi))
+
 class Voxels(object):
     def __init__(self, iter_gen, length, dv):
         self._iter_gen = iter_gen
         self.length = length
         self.ran = ~((~1)<<length)
         self.dv = dv
+        self._points = None
 
     def __iter__(self):
         return islice(self._iter_gen(), self.length)
@@ -46,12 +87,63 @@ class Voxels(object):
     def __len__(self):
         return self.length
 
+    @property
+    def points(self):
+        """
+        centers of voxels as `(N,3)` array, in the same order as iteration.
+        """
+        if self._points is None:
+            import numpy
+            self._points = numpy.array(list(self), dtype=float).reshape(self.length, -1)
+        return self._points
+
+    def indices_in(self, box):
+        """
+        indices of voxels in bounding box `box`.
+        """
+        import numpy
+        points = self.points
+        inside = numpy.ones(len(points), dtype=bool)
+        for n, (lo, hi) in enumerate(box):
+            inside &= (points[:,n] >= lo) & (points[:,n] <= hi)
+        return numpy.nonzero(inside)[0]
+
+class CubeVoxels(Voxels):
+    def __init__(self, r=2.0, n=10):
+        self.rn = int(r*n)
+        self.dr = 1.0/n
+        Voxels.__init__(self, self._gen, (2*self.rn+1)**3, self.dr**3)
+
+    def _gen(self):
+        rn = self.rn
+        dr = self.dr
+        return ((xn*dr, yn*dr, zn*dr)
+                for xn, yn, zn in product(range(-rn, rn+1), repeat=3))
+
+    @property
+    def points(self):
+        if self._points is None:
+            import numpy
+            axis = numpy.arange(-self.rn, self.rn+1)*self.dr
+            grid = numpy.meshgrid(axis, axis, axis, indexing="ij")
+            self._points = numpy.stack(grid, axis=-1).reshape(-1, 3)
+        return self._points
+
+    def indices_in(self, box):
+        # ranges of grid indices, widened by one voxel against rounding
+        import numpy
+        rn = self.rn
+        size = 2*rn+1
+        axes = []
+        for lo, hi in box:
+            start = int(numpy.clip(numpy.ceil(lo/self.dr)-1, -rn, rn+1))
+            stop = int(numpy.clip(numpy.floor(hi/self.dr)+1, -rn-1, rn))
+            axes.append(numpy.arange(start, stop+1)+rn)
+        xs, ys, zs = axes
+        return ((xs[:,None,None]*size + ys[None,:,None])*size + zs[None,None,:]).ravel()
+
 def cube_voxels(r=2.0, n=10):
-    rn = int(r*n)
-    dr = 1.0/n
-    gen = lambda: ((xn*dr, yn*dr, zn*dr)
-                   for xn, yn, zn in product(range(-rn, rn+1), repeat=3))
-    return Voxels(gen, (2*rn+1)**3, dr**3)
+    return CubeVoxels(r, n)
 
 
 class VoxelEngine(SolidEngine):
@@ -77,6 +169,10 @@ class VoxelEngine(SolidEngine):
     def _construct(self, zet):
         if not isinstance(zet, AbstractSet):
             zet = as_abstract(zet)
+        if not isinstance(zet, AbstractSet):
+            # composite primitive, such as `Box`, is combination of abstract
+            # sets, which are lambdified one by one
+            return self.construct(zet)
         var = zet.variables
         expr = zet.expr
         func = lambdify(var, expr)
@@ -112,6 +208,184 @@ class VoxelEngine(SolidEngine):
     def volume_of(self, obj):
         return self.voxels.dv * bitcount(obj)
 
-def cube_engine(r=2.0, n=10):
-    return VoxelEngine(cube_voxels(r, n))
+    def signature_of(self, obj):
+        return obj.to_bytes(len(self.voxels)//8+1, "little", signed=True)
+
+    def _pack(self, mask):
+        import numpy
+        return int.from_bytes(numpy.packbits(mask, bitorder="little").tobytes(), "little")
+
+    def _unpack(self, obj):
+        import numpy
+        data = numpy.frombuffer(self.signature_of(obj), dtype=numpy.uint8)
+        return numpy.unpackbits(data, count=len(self.voxels), bitorder="little").astype(bool)
+
+    def dilate(self, obj, radius, axis=None):
+        """
+        voxels whose centers are within `radius` of voxels of `obj`, where
+        only offsets perpendicular to unit vector `axis` (up to half voxel)
+        are considered if given.
+
+        >>> from symplus.euclid import Sphere
+        >>> engine = cube_engine(2.0, 5)
+        >>> ball = engine.construct(Sphere(0.3))
+        >>> engine.bound_of(engine.dilate(ball, 0.4, (0, 0, 1)))[2]
+        (-0.2, 0.2)
+        >>> far = engine.construct(Sphere(0.3, [1.2, 0, 0]))
+        >>> engine.is_swept_outside([ball], 0.4, far), engine.is_swept_outside([ball], 0.8, far)
+        (True, False)
+        """
+        import numpy
+        if not isinstance(self.voxels, CubeVoxels):
+            raise NotImplementedError
+        size = 2*self.voxels.rn+1
+        grid = self._unpack(obj).reshape(size, size, size)
+        # round up to whole voxels, so that the dilation covers the radius
+        n = min(int(numpy.ceil(radius/self.voxels.dr)), size-1)
+        steps = numpy.arange(-n, n+1)
+        offsets = numpy.stack(numpy.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+        offsets = offsets[(offsets**2).sum(axis=1) <= n**2]
+        if axis is not None:
+            offsets = offsets[abs(offsets.dot(numpy.asarray(axis, dtype=float))) <= 0.5]
+
+        res = grid.copy()
+        for offset in offsets.tolist():
+            dst = tuple(slice(max(0, d), size+min(0, d)) for d in offset)
+            src = tuple(slice(max(0, -d), size+min(0, -d)) for d in offset)
+            res[dst] |= grid[src]
+        return self._pack(res.ravel())
+
+    def is_swept_outside(self, objs, radius, reg, axis=None):
+        if not isinstance(self.voxels, CubeVoxels):
+            return False
+        return self.is_outside(self.fuse([self.dilate(obj, radius, axis) for obj in objs]), reg)
+
+    def bound_of(self, obj):
+        if not isinstance(self.voxels, CubeVoxels) or obj < 0:
+            return None
+        if obj == 0:
+            return ((float("inf"), float("-inf")),)
+        rn, dr = self.voxels.rn, self.voxels.dr
+        return tuple(((lo-rn)*dr, (hi-rn)*dr) for lo, hi in bitbound(obj, 2*rn+1))
+
+class VectorizedVoxelEngine(VoxelEngine):
+    """
+    voxel engine which rasterizes primitives over all voxels at once.
+    the primitive is compiled by `as_predicate` and evaluated on the cached
+    array `voxels.points`, then the boolean mask is packed into bitmap, so the
+    result is the same as `VoxelEngine`.
+    """
+    @lru_cache(maxsize=128)
+    def _construct(self, zet):
+        return self._pack(self._mask(zet))
+
+    def _mask(self, zet):
+        # only evaluate voxels in the bounding box of `zet`
+        import numpy
+        points = self.voxels.points
+        box = bounding_box(zet)
+        if box is None:
+            return as_predicate(zet)(points)
+        inds = self.voxels.indices_in(box)
+        mask = numpy.zeros(len(points), dtype=bool)
+        if len(inds) > 0:
+            mask[inds] = as_predicate(zet)(points[inds])
+        return mask
+
+class PackedVoxelEngine(VectorizedVoxelEngine):
+    """
+    voxel engine which stores occupancy as fixed-length buffer of packed
+    `numpy.uint64` words rather than python int.  bits beyond the last voxel
+    are always kept zero, so complement need not to be masked by `Voxels.ran`.
+
+    >>> from symplus.euclid import Sphere, Box, Halfspace
+    >>> from symplus.matplus import i
+    >>> voxels = cube_voxels(1.0, 4)
+    >>> ref, packed = VoxelEngine(voxels), PackedVoxelEngine(voxels)
+    >>> as_int = lambda obj: int.from_bytes(obj.tobytes(), "little")
+    >>> zets = [Sphere(), Box(), Halfspace(0, i)]
+    >>> [as_int(packed.construct(zet)) == ref.construct(zet) for zet in zets]
+    [True, True, True]
+    >>> a, b, c = map(packed.construct, zets)
+    >>> a_, b_, c_ = map(ref.construct, zets)
+    >>> obj = packed.fuse([packed.common([a, c]), packed.cut(b, a)])
+    >>> as_int(obj) == ref.fuse([ref.common([a_, c_]), ref.cut(b_, a_)])
+    True
+    >>> packed.volume_of(packed.complement(a)) == voxels.dv*len(voxels) - ref.volume_of(a_)
+    True
+    >>> packed.is_inside(obj, b), ref.is_inside(as_int(obj), b_)
+    (True, True)
+    """
+    def __init__(self, voxels, operations=(Union, Intersection, AbsoluteComplement, Complement)):
+        import numpy
+        VectorizedVoxelEngine.__init__(self, voxels, operations)
+        self.nwords = -(-len(voxels)//64)
+        self.tail = numpy.uint64((1<<(len(voxels)-64*(self.nwords-1)))-1)
+        self._buffer = numpy.zeros(self.nwords, dtype="<u8")
+
+    def _pack(self, mask):
+        import numpy
+        data = numpy.zeros(self.nwords*8, dtype=numpy.uint8)
+        packed = numpy.packbits(mask, bitorder="little")
+        data[:len(packed)] = packed
+        return data.view("<u8")
+
+    def common(self, objs):
+        objs = iter(objs)
+        res = next(objs).copy()
+        for obj in objs:
+            res &= obj
+        return res
+
+    def fuse(self, objs):
+        objs = iter(objs)
+        res = next(objs).copy()
+        for obj in objs:
+            res |= obj
+        return res
+
+    def complement(self, obj):
+        res = ~obj
+        res[-1] &= self.tail
+        return res
+
+    def cut(self, obj1, obj2):
+        res = ~obj2
+        res &= obj1
+        return res
+
+    def is_null(self, obj):
+        return not obj.any()
+
+    def is_outside(self, obj, reg):
+        buf = self._buffer
+        buf[:] = obj
+        buf &= reg
+        return not buf.any()
+
+    def is_inside(self, obj, reg):
+        buf = self._buffer
+        buf[:] = reg
+        buf ^= obj
+        buf &= obj
+        return not buf.any()
+
+    def is_equal(self, obj1, obj2):
+        return bool((obj1 == obj2).all())
+
+    def volume_of(self, obj):
+        return self.voxels.dv * popcount(obj)
+
+    def signature_of(self, obj):
+        return obj.tobytes()
+
+    def _unpack(self, obj):
+        import numpy
+        return numpy.unpackbits(obj.view(numpy.uint8), count=len(self.voxels), bitorder="little").astype(bool)
+
+    def bound_of(self, obj):
+        return VoxelEngine.bound_of(self, int.from_bytes(obj.tobytes(), "little"))
+
+def cube_engine(r=2.0, n=10, engine_type=VoxelEngine):
+    return engine_type(cube_voxels(r, n))
 
@@ -0,0 +1,364 @@
+from math import sqrt, atan, atan2, asin
+from functools import reduce
+from sympy.core import S
+from sympy.core.compatibility import lru_cache
+from sympy.sets import Set, Intersection, Union, Complement
+from symplus.setplus import as_predicate, bounding_box, Image, AbsoluteComplement
+from symplus.euclid import (WholeSpace, Halfspace, Sphere, InfiniteCylinder,
+    SemiInfiniteCone, Box, Cylinder, Cone)
+from magicpy.solid.general import SolidEngine
+from magicpy.util import map, zip, range
+
+
+# octree is represented as nested tuple: leaf is True (full) or False (empty),
+# and mixed node is tuple of 8 children, ordered by (x, y, z) with x outermost.
+
+def octnode(children):
+    first = children[0]
+    if isinstance(first, bool) and all(child is first for child in children):
+        return first
+    return tuple(children)
+
+def octand(tree1, tree2):
+    if tree1 is False or tree2 is True:
+        return tree1
+    if tree2 is False or tree1 is True:
+        return tree2
+    return octnode(tuple(map(octand, tree1, tree2)))
+
+def octor(tree1, tree2):
+    if tree1 is True or tree2 is False:
+        return tree1
+    if tree2 is True or tree1 is False:
+        return tree2
+    return octnode(tuple(map(octor, tree1, tree2)))
+
+def octnot(tree):
+    if isinstance(tree, bool):
+        return not tree
+    return tuple(map(octnot, tree))
+
+def octdisjoint(tree1, tree2):
+    if tree1 is False or tree2 is False:
+        return True
+    if tree1 is True or tree2 is True:
+        return False
+    return all(map(octdisjoint, tree1, tree2))
+
+def octsubset(tree1, tree2):
+    if tree1 is False or tree2 is True:
+        return True
+    if tree1 is True or tree2 is False:
+        return False
+    return all(map(octsubset, tree1, tree2))
+
+def octcount(tree, vol):
+    if isinstance(tree, bool):
+        return vol if tree else 0.0
+    return sum(octcount(child, vol/8) for child in tree)
+
+def octbound(tree, x, y, z, h):
+    if tree is False:
+        return None
+    if tree is True:
+        return ((x-h, x+h), (y-h, y+h), (z-h, z+h))
+    h = h/2
+    centers = ((x+dx, y+dy, z+dz) for dx in (-h, h) for dy in (-h, h) for dz in (-h, h))
+    bounds = [bd for bd in (octbound(child, cx, cy, cz, h)
+                            for child, (cx, cy, cz) in zip(tree, centers))
+              if bd is not None]
+    return tuple((min(bd[n][0] for bd in bounds), max(bd[n][1] for bd in bounds))
+                 for n in range(3))
+
+def octsize(tree):
+    if isinstance(tree, bool):
+        return 1
+    return 1 + sum(map(octsize, tree))
+
+
+# cell classifiers: `classify(x, y, z, h)` tells whether the cube cell with
+# center (x, y, z) and half size h is inside (True), outside (False) or mixed
+# (None); `sample(x, y, z)` tells whether the point is inside.
+
+def _floats(vec):
+    return tuple(float(v) for v in vec)
+
+def _halfspace_classifier(zet):
+    o = float(zet.offset)
+    dx, dy, dz = _floats(zet.direction)
+    ad = abs(dx) + abs(dy) + abs(dz)
+    closed = bool(zet.closed)
+    def classify(x, y, z, h):
+        s = dx*x + dy*y + dz*z - o
+        e = h*ad
+        if s > e:
+            return True
+        elif s < -e:
+            return False
+    def sample(x, y, z):
+        s = dx*x + dy*y + dz*z - o
+        return s >= 0 if closed else s > 0
+    return classify, sample
+
+def _sphere_classifier(zet):
+    r = float(zet.radius)
+    cx, cy, cz = _floats(zet.center)
+    closed = bool(zet.closed)
+    def classify(x, y, z, h):
+        ux, uy, uz = abs(x-cx), abs(y-cy), abs(z-cz)
+        if (ux+h)**2 + (uy+h)**2 + (uz+h)**2 < r**2:
+            return True
+        vx, vy, vz = max(ux-h, 0.0), max(uy-h, 0.0), max(uz-h, 0.0)
+        if vx**2 + vy**2 + vz**2 > r**2:
+            return False
+    def sample(x, y, z):
+        s = (x-cx)**2 + (y-cy)**2 + (z-cz)**2
+        return s <= r**2 if closed else s < r**2
+    return classify, sample
+
+def _infinite_cylinder_classifier(zet):
+    r = float(zet.radius)
+    cx, cy, cz = _floats(zet.center)
+    dx, dy, dz = _floats(zet.direction)
+    closed = bool(zet.closed)
+    def dist2(x, y, z):
+        px, py, pz = x-cx, y-cy, z-cz
+        return (py*dz-pz*dy)**2 + (pz*dx-px*dz)**2 + (px*dy-py*dx)**2
+    def classify(x, y, z, h):
+        rho = sqrt(dist2(x, y, z))
+        b = h*sqrt(3)
+        if rho + b < r:
+            return True
+        elif rho - b > r:
+            return False
+    def sample(x, y, z):
+        s = dist2(x, y, z)
+        return s <= r**2 if closed else s < r**2
+    return classify, sample
+
+def _semi_infinite_cone_classifier(zet):
+    k = float(zet.slope)
+    cx, cy, cz = _floats(zet.center)
+    dx, dy, dz = _floats(zet.direction)
+    alpha = atan(k)
+    closed = bool(zet.closed)
+    def polar(x, y, z):
+        px, py, pz = x-cx, y-cy, z-cz
+        c = sqrt((py*dz-pz*dy)**2 + (pz*dx-px*dz)**2 + (px*dy-py*dx)**2)
+        return c, px*dx + py*dy + pz*dz
+    def classify(x, y, z, h):
+        b = h*sqrt(3)
+        c, d = polar(x, y, z)
+        l = sqrt(c**2 + d**2)
+        if l <= b:
+            return None
+        theta = atan2(c, d)
+        beta = asin(b/l)
+        if theta + beta < alpha:
+            return True
+        elif theta - beta > alpha:
+            return False
+    def sample(x, y, z):
+        c, d = polar(x, y, z)
+        return c <= k*d if closed else c < k*d
+    return classify, sample
+
+def _image_classifier(inv, cls):
+    # the cell mapped back by affine `inv` is in the cube of half size
+    # `h*scale` around the mapped center
+    classify_, sample_ = cls
+    (a, b, c, u), (d, e, f, v), (g, k, l, w) = inv.augmat[:3].tolist()
+    scale = max(abs(a)+abs(b)+abs(c), abs(d)+abs(e)+abs(f), abs(g)+abs(k)+abs(l))
+    def classify(x, y, z, h):
+        return classify_(a*x+b*y+c*z+u, d*x+e*y+f*z+v, g*x+k*y+l*z+w, h*scale)
+    def sample(x, y, z):
+        return sample_(a*x+b*y+c*z+u, d*x+e*y+f*z+v, g*x+k*y+l*z+w)
+    return classify, sample
+
+def _predicate_classifier(zet):
+    pred = as_predicate(zet)
+    box = bounding_box(zet)
+    def classify(x, y, z, h):
+        # only cells outside the bounding box are known
+        if box is not None and any(p+h < lo or p-h > hi
+                                   for p, (lo, hi) in zip((x, y, z), box)):
+            return False
+        return None
+    def sample(x, y, z):
+        return bool(pred([(x, y, z)])[0])
+    return classify, sample
+
+def _constant_classifier(value):
+    def classify(x, y, z, h):
+        return value
+    def sample(x, y, z):
+        return value
+    return classify, sample
+
+def _all_classifier(clss):
+    clss = tuple(clss)
+    def classify(x, y, z, h):
+        res = True
+        for cls, _ in clss:
+            c = cls(x, y, z, h)
+            if c is False:
+                return False
+            elif c is None:
+                res = None
+        return res
+    def sample(x, y, z):
+        return all(smp(x, y, z) for _, smp in clss)
+    return classify, sample
+
+def _any_classifier(clss):
+    clss = tuple(clss)
+    def classify(x, y, z, h):
+        res = False
+        for cls, _ in clss:
+            c = cls(x, y, z, h)
+            if c is True:
+                return True
+            elif c is None:
+                res = None
+        return res
+    def sample(x, y, z):
+        return any(smp(x, y, z) for _, smp in clss)
+    return classify, sample
+
+def _not_classifier(cls):
+    classify_, sample_ = cls
+    def classify(x, y, z, h):
+        c = classify_(x, y, z, h)
+        return None if c is None else not c
+    def sample(x, y, z):
+        return not sample_(x, y, z)
+    return classify, sample
+
+primitive_classifiers = {
+    Halfspace: _halfspace_classifier,
+    Sphere: _sphere_classifier,
+    InfiniteCylinder: _infinite_cylinder_classifier,
+    SemiInfiniteCone: _semi_infinite_cone_classifier,
+}
+
+
+class OctreeEngine(SolidEngine):
+    """
+    adaptive octree engine over the cube [-r, r]^3.
+    each node is full, empty or mixed, and only mixed nodes are refined, until
+    `depth`, where the cell is decided by its center.  primitives of
+    `symplus.euclid` classify the whole cell by distance bounds, so the
+    effective resolution `2**depth` costs memory only near the surfaces.
+
+    >>> from symplus.euclid import Sphere, Halfspace
+    >>> engine = OctreeEngine(r=2.0, depth=6)
+    >>> ball = engine.construct(Sphere())
+    >>> round(engine.volume_of(ball), 2)
+    4.21
+    >>> engine.is_outside(engine.construct(Halfspace(1)), ball)
+    True
+    >>> engine.is_inside(ball, engine.construct(Sphere(2)))
+    True
+
+    moved piece is classified in the frame of the primitive, so only cells
+    near its surface are refined, as for unmoved one:
+
+    >>> from sympy import pi
+    >>> from symplus.setplus import Image
+    >>> from symplus.affine import EuclideanTransformation, rquat
+    >>> from symplus.euclid import Box
+    >>> t = EuclideanTransformation([0.3,0,0], rquat(pi/5, [1,1,0]))
+    >>> piece = Image(t, Box(), evaluate=False)
+    >>> tree = engine.construct(piece)
+    >>> tree == engine._build(*_predicate_classifier(piece), x=0.0, y=0.0, z=0.0, h=2.0, depth=6)
+    True
+    >>> octsize(tree) < 8**6//16
+    True
+    """
+    def __init__(self, r=2.0, depth=8, operations=(Union, Intersection, AbsoluteComplement, Complement)):
+        self.r = float(r)
+        self.depth = depth
+        self.operations = operations
+
+    @lru_cache(maxsize=128)
+    def construct(self, zet):
+        classify, sample = self._classifier(zet)
+        return self._build(classify, sample, 0.0, 0.0, 0.0, self.r, self.depth)
+
+    def _classifier(self, zet):
+        if isinstance(zet, self.operations[0]):
+            return _any_classifier(map(self._classifier, zet.args))
+        elif isinstance(zet, self.operations[1]):
+            return _all_classifier(map(self._classifier, zet.args))
+        elif isinstance(zet, self.operations[2]):
+            return _not_classifier(self._classifier(zet.args[0]))
+        elif len(self.operations) > 3 and isinstance(zet, self.operations[3]):
+            return _all_classifier([self._classifier(zet.args[0]),
+                                    _not_classifier(self._classifier(zet.args[1]))])
+        elif zet == S.EmptySet:
+            return _constant_classifier(False)
+        elif isinstance(zet, WholeSpace) or zet == S.UniversalSet:
+            return _constant_classifier(True)
+        elif type(zet) in primitive_classifiers:
+            return primitive_classifiers[type(zet)](zet)
+        elif isinstance(zet, (Box, Cylinder, Cone)):
+            return _all_classifier(map(self._classifier, zet.as_algebraic().args))
+        elif isinstance(zet, Image) and hasattr(zet.function, 'as_numeric'):
+            try:
+                inv = zet.function.as_numeric().inv()
+            except TypeError:
+                return _predicate_classifier(zet)
+            return _image_classifier(inv, self._classifier(zet.set))
+        elif isinstance(zet, Set):
+            return _predicate_classifier(zet)
+        else:
+            raise TypeError
+
+    def _build(self, classify, sample, x, y, z, h, depth):
+        c = classify(x, y, z, h)
+        if c is not None:
+            return c
+        if depth == 0:
+            return sample(x, y, z)
+        h = h/2
+        return octnode(tuple(self._build(classify, sample, x+dx, y+dy, z+dz, h, depth-1)
+                             for dx in (-h, h) for dy in (-h, h) for dz in (-h, h)))
+
+    def common(self, objs):
+        return reduce(octand, objs)
+
+    def fuse(self, objs):
+        return reduce(octor, objs)
+
+    def complement(self, obj):
+        return octnot(obj)
+
+    def cut(self, obj1, obj2):
+        return octand(obj1, octnot(obj2))
+
+    def is_null(self, obj):
+        return obj is False
+
+    def is_outside(self, obj, reg):
+        return octdisjoint(obj, reg)
+
+    def is_inside(self, obj, reg):
+        return octsubset(obj, reg)
+
+    def is_equal(self, obj1, obj2):
+        return obj1 == obj2
+
+    def volume_of(self, obj):
+        return octcount(obj, (2*self.r)**3)
+
+    def signature_of(self, obj):
+        return repr(obj).encode("ascii")
+
+    def bound_of(self, obj):
+        bound = octbound(obj, 0.0, 0.0, 0.0, self.r)
+        if bound is None:
+            return ((float("inf"), float("-inf")),)
+        return bound
+
+def octree_engine(r=2.0, depth=8):
+    return OctreeEngine(r, depth)
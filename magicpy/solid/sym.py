@@ -1,45 +1,91 @@
-from sympy import S, pi, N
-from sympy.sets import EmptySet
+from functools import reduce
+from sympy.core.compatibility import lru_cache
+from sympy import S, pi, N, srepr
+from sympy.sets import Set, EmptySet
 from symplus.matplus import normalize, dot, project
 from symplus.funcplus import FunctionInverse
 from symplus.setplus import (Image, Intersection, Union, Complement, AbsoluteComplement,
     OpenRegularizedIntersection, OpenRegularizedUnion,
-    OpenRegularizedAbsoluteComplement, simplify_boolean)
+    OpenRegularizedAbsoluteComplement, regularize, simplify_boolean, bounding_box,
+    intern_table)
 from symplus.euclid import (EuclideanSpace, Halfspace,
     Sphere, Box, Cylinder, Cone, EmptySpace,
-    WholeSpace, Halfspace, InfiniteCylinder, SemiInfiniteCone)
-from symplus.affine import (AffineTransformation, EuclideanTransformation,
+    WholeSpace, Halfspace, InfiniteCylinder, SemiInfiniteCone,
+    canonicalize, get_numeric_mode)
+from symplus.affine import (Transformation, AffineTransformation, EuclideanTransformation,
     rmat2rquat, thax, thax_k2d)
-from magicpy.solid.general import SolidEngine, OpenSCADDisplayer
+from magicpy.solid.general import SolidEngine, OpenSCADDisplayer, bound_common
+from magicpy.util import LRUCache
 
 
+def _image(trans, zet):
+    return Image(trans, zet, evaluate=True)
+
+def _canonical_image(trans, zet):
+    return _canonical_image_(trans, zet, get_numeric_mode())
+
+@lru_cache(maxsize=4096)
+def _canonical_image_(trans, zet, tolerance):
+    # memoized, since pieces of puzzle are moved to the same places repeatedly
+    return canonicalize(Image(trans, zet, evaluate=True))
+
 class SymbolicSolidEngine(SolidEngine):
+    canonicalization = True
+    bdd_threshold = 8
+    # share structurally equal nodes of resulting solids by `intern_table`
+    interning = True
+
     def __init__(self):
         self.variables = {}
         self.operations = (OpenRegularizedUnion,
                            OpenRegularizedIntersection,
                            OpenRegularizedAbsoluteComplement)
 
+    def _intern(self, zet):
+        return intern_table.intern(zet) if self.interning else zet
+
     def common(self, zets):
-        return self.operations[1](*zets)
+        return self._intern(self.operations[1](*zets))
 
     def fuse(self, zets):
-        return self.operations[0](*zets)
+        return self._intern(self.operations[0](*zets))
 
     def complement(self, zet):
-        return self.operations[2](zet)
+        return self._intern(self.operations[2](zet))
 
     def transform(self, zets, *transs):
+        image = _canonical_image if self.canonicalization else _image
         for trans in transs:
             if isinstance(trans, Transformation):
-                zets = [Image(trans, zet, evaluate=True) for zet in zets]
+                zets = [image(trans, zet) for zet in zets]
             else:
-                zets = [Image(t, zet, evaluate=True) for zet in zets for t in trans]
-        return zets
+                zets = [image(t, zet) for zet in zets for t in trans]
+        return list(map(self._intern, zets))
 
     def is_null(self, zet):
         return zet == EmptySet()
 
+    def bound_of(self, zet):
+        # `bounding_box` is memoized
+        return bounding_box(zet.subs(self.variables) if self.variables else zet)
+
+    def signature_of(self, zet):
+        # arguments of boolean operations are unordered
+        if isinstance(zet, self.operations):
+            sigs = sorted(map(self.signature_of, zet.args))
+            return type(zet).__name__.encode("ascii") + b"(" + b",".join(sigs) + b")"
+        return srepr(zet.subs(self.variables)).encode("utf-8")
+
+    # cells are pruned by analytic bounding boxes
+    def _cell_start(self, zet):
+        return SymbolicSolidEngine.bound_of(self, zet)
+
+    def _cell_extend(self, bd, zet):
+        return bound_common(bd, SymbolicSolidEngine.bound_of(self, zet))
+
+    def _cell_is_null(self, bd):
+        return bd is not None and any(lo > hi for lo, hi in bd)
+
     def simp(self, zet):
         zet = zet.replace(
             lambda e: isinstance(e, Set) and hasattr(e, "as_algebraic"),
@@ -53,21 +99,62 @@ class SymbolicSolidEngine(SolidEngine):
             lambda e: isinstance(e, Halfspace) and hash(e.direction) < hash(-e.direction),
             lambda e: AbsoluteComplement(AbsoluteComplement(e, evaluate=True), evaluate=False),
             simultaneous=False)
-        zet = regularize(zet, closed=False)
-        zet = simplify_boolean(zet, op=self.operations)
+        zet = regularize(zet, evaluate=True, closed=False)
+        zet = simplify_boolean(zet, op=self.operations, threshold=self.bdd_threshold)
+        return self._intern(zet)
 
 class SymbolicSolidEngineVolumeAlgo(SymbolicSolidEngine):
-    def __init__(self, subengine):
+    """
+    symbolic solid engine which tests solids by rasterizing them with
+    `subengine`.  arguments of boolean operations are reduced incrementally
+    by `_volalgo` if `incremental` is True, which gives the same result as
+    naive reduction.
+
+    >>> from symplus.euclid import Box, Halfspace, Sphere
+    >>> from symplus.matplus import i, j, k
+    >>> from magicpy.solid.marching import cube_engine
+    >>> naive = SymbolicSolidEngineVolumeAlgo(cube_engine(2.0, 5))
+    >>> naive.incremental = False
+    >>> incr = SymbolicSolidEngineVolumeAlgo(cube_engine(2.0, 5))
+    >>> zet1 = incr.common([Sphere(), Halfspace(-3, i), Halfspace(0, j)])
+    >>> zet2 = incr.fuse([Sphere(), Sphere(0.5), incr.common([Halfspace(0, k), Box()])])
+    >>> [naive.simp(zet) == incr.simp(zet) for zet in (zet1, zet2)]
+    [True, True]
+    >>> incr.simp(zet1) == incr.common([Sphere(), Halfspace(0, j)])
+    True
+    """
+    incremental = True
+
+    def __init__(self, subengine, cache_size=1024):
         SymbolicSolidEngine.__init__(self)
         self.subengine = subengine
         subengine.operations = self.operations
+        self.cache = LRUCache(cache_size)
 
     def _cvrt(self, zet, ran=None):
-        sub = self.subengine.construct(zet.subs(self.variables))
+        sub = self._construct(zet)
         if ran is not None:
             sub = self.subengine.common([sub, ran])
         return sub
 
+    def _construct(self, zet):
+        # structural cache, boolean nodes are built from cached arguments
+        key = (zet, frozenset(self.variables.items()))
+        sub = self.cache.get(key)
+        if sub is not None:
+            return sub
+
+        if isinstance(zet, self.operations[0]):
+            sub = self.subengine.fuse([self._construct(arg) for arg in zet.args])
+        elif isinstance(zet, self.operations[1]):
+            sub = self.subengine.common([self._construct(arg) for arg in zet.args])
+        elif isinstance(zet, self.operations[2]):
+            sub = self.subengine.complement(self._construct(zet.args[0]))
+        else:
+            sub = self.subengine.construct(zet.subs(self.variables))
+        self.cache[key] = sub
+        return sub
+
     def _veq(self, sub1, sub2, ran=None):
         if ran is not None:
             sub1 = self.subengine.common([sub1, ran])
@@ -88,6 +175,36 @@ class SymbolicSolidEngineVolumeAlgo(SymbolicSolidEngine):
     def is_inside(self, zet1, zet2):
         return self.subengine.is_inside(self._cvrt(zet1), self._cvrt(zet2))
 
+    def bound_of(self, zet):
+        # analytic bound if it is finite, otherwise bound of rasterized solid
+        box = SymbolicSolidEngine.bound_of(self, zet)
+        if box is not None and all(abs(v) != float("inf") for bd in box for v in bd):
+            return box
+        return self.subengine.bound_of(self._cvrt(zet))
+
+    def is_swept_outside(self, zets, radius, reg, axis=None):
+        return self.subengine.is_swept_outside([self._cvrt(zet) for zet in zets], radius,
+                                               self._cvrt(reg), axis)
+
+    def signature_of(self, zet):
+        # quantized by voxels
+        return self.subengine.signature_of(self._cvrt(zet))
+
+    # cells are pruned by analytic bounding boxes, then by rasterized solids
+    def _cell_start(self, zet):
+        return SymbolicSolidEngine._cell_start(self, zet), self._cvrt(zet)
+
+    def _cell_extend(self, data, zet):
+        bd, sub = data
+        bd = SymbolicSolidEngine._cell_extend(self, bd, zet)
+        if SymbolicSolidEngine._cell_is_null(self, bd):
+            return bd, None
+        return bd, self.subengine.common([sub, self._cvrt(zet)])
+
+    def _cell_is_null(self, data):
+        bd, sub = data
+        return sub is None or SymbolicSolidEngine._cell_is_null(self, bd) or self.subengine.is_null(sub)
+
     def no_collision(self, zets):
         return self.subengine.no_collision(map(self._cvrt, zets))
 
@@ -96,7 +213,7 @@ class SymbolicSolidEngineVolumeAlgo(SymbolicSolidEngine):
         return self.subengine.no_cross_collision(cols)
 
     def simp(self, zet):
-        return self._volalgo(super(SymbolicSolidEngineVolumeAlgo, self).simp(zet))
+        return self._intern(self._volalgo(super(SymbolicSolidEngineVolumeAlgo, self).simp(zet)))
 
     def _volalgo(self, zet, ran=None):
         if zet.subs(self.variables) in (S.EmptySet, S.UniversalSet):
@@ -112,41 +229,73 @@ class SymbolicSolidEngineVolumeAlgo(SymbolicSolidEngine):
             return S.UniversalSet
 
         if isinstance(zet, self.operations[1]):
-            # remove unimportant arguments
-            args = set(zet.args)
-            for arg in list(args):
-                args.discard(arg)
-                sub_ = self._cvrt(self.common(args), ran)
-                if not self._veq(sub_, sub):
-                    args.add(arg)
-
-            # simplify remaining arguments
-            for arg in list(args):
-                args.discard(arg)
-                remaining = self._cvrt(self.common(args))
-                ran_ = self.subengine.common([ran, remaining])
-                args.add(self._volalgo(arg, ran_))
+            restrict = lambda rem: self.subengine.common([ran, rem])
+            args = self._volalgo_args(zet, sub, ran, self.common, self.subengine.common, ran, restrict)
             return self.common(args)
 
         elif isinstance(zet, self.operations[0]):
+            restrict = lambda rem: self.subengine.cut(ran, rem)
+            empty = self.subengine.cut(ran, ran)
+            args = self._volalgo_args(zet, sub, ran, self.fuse, self.subengine.fuse, empty, restrict)
+            return self.fuse(args)
+
+        else:
+            return zet
+
+    def _volalgo_args(self, zet, sub, ran, build, op, ident, restrict):
+        args = set(zet.args)
+
+        if not self.incremental:
             # remove unimportant arguments
-            args = set(zet.args)
             for arg in list(args):
                 args.discard(arg)
-                sub_ = self._cvrt(self.fuse(args), ran)
+                sub_ = self._cvrt(build(args), ran)
                 if not self._veq(sub_, sub):
                     args.add(arg)
 
             # simplify remaining arguments
             for arg in list(args):
                 args.discard(arg)
-                remaining = self._cvrt(self.fuse(args))
-                ran_ = self.subengine.cut(ran, remaining)
-                args.add(self._volalgo(arg, ran_))
-            return self.fuse(args)
-
-        else:
-            return zet
+                remaining = self._cvrt(build(args))
+                args.add(self._volalgo(arg, restrict(remaining)))
+            return args
+
+        # remove unimportant arguments, where the others are combined from
+        # the kept arguments before and all arguments after
+        order = list(args)
+        suffix = self._suffix_products(order, ran, op, ident)
+        prefix = ident
+        for i, arg in enumerate(order):
+            args.discard(arg)
+            if not self._veq(op([prefix, suffix[i+1]]), sub):
+                args.add(arg)
+                prefix = op([prefix, self._cvrt(arg, ran)])
+
+        # simplify remaining arguments, where the arguments before are
+        # already simplified
+        order = list(args)
+        suffix = self._suffix_products(order, ran, op, ident)
+        prefix = ident
+        done = {}
+        for i, arg in enumerate(order):
+            args.discard(arg)
+            if arg in done:
+                # simplified argument coincides with this one
+                del done[arg]
+                prefix = reduce(lambda a, b: op([a, b]), done.values(), ident)
+            arg_ = self._volalgo(arg, restrict(op([prefix, suffix[i+1]])))
+            args.add(arg_)
+            if arg_ not in done:
+                done[arg_] = self._cvrt(arg_, ran)
+                prefix = op([prefix, done[arg_]])
+        return args
+
+    def _suffix_products(self, args, ran, op, ident):
+        suffix = [ident]
+        for arg in reversed(args):
+            suffix.append(op([self._cvrt(arg, ran), suffix[-1]]))
+        suffix.reverse()
+        return suffix
 
 
 class SymbolicOpenSCADDisplayer(OpenSCADDisplayer):
@@ -169,7 +318,16 @@ class SymbolicOpenSCADDisplayer(OpenSCADDisplayer):
         self.bdradius = 5.
 
     def interpret(self, obj):
-        return self._interpret(self.bounding(obj))
+        return self._interpret(self.bounding(obj, self.bounding_sphere(obj)))
+
+    def bounding_sphere(self, obj):
+        # sphere around analytic bounding box, or default sphere
+        box = bounding_box(obj)
+        if box is None or any(abs(v) == float("inf") or lo > hi for lo, hi in box for v in (lo, hi)):
+            return Sphere(radius=self.bdradius)
+        center = [(lo+hi)/2 for lo, hi in box]
+        radius = sum((hi-lo)**2 for lo, hi in box)**0.5/2
+        return Sphere(radius=radius*1.01, center=center)
 
     def bounding(self, obj, bd=None):
         if bd is None:
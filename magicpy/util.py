@@ -1,5 +1,7 @@
 import sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__), "../lib"))
+# LRU helper is shared with symplus, which cannot depend on magicpy
+from symplus.util import CacheInfo, LRUCache
 
 
 if sys.version_info[0] == 2:
@@ -1,5 +1,5 @@
 from sympy.core import Ne, Eq, Symbol, Lambda, Tuple, pi, Dummy, sympify
-from sympy.core.compatibility import with_metaclass
+from sympy.core.compatibility import with_metaclass, lru_cache
 from sympy.core.singleton import Singleton
 from sympy.simplify import simplify
 from sympy.sets import Set, Intersection, Union, Complement, EmptySet, ImageSet
@@ -11,6 +11,7 @@ from symplus.typlus import is_Tuple, is_Function, free_symbols
 from symplus.strplus import mstr_inline_Matrix
 from symplus.funcplus import FunctionObject, compose, inverse
 from symplus.setplus import AbstractSet, Image
+from symplus.simplus import cached_simplify
 from symplus.matplus import Mat, norm, normalize, dot, cross, project, i, j, k, x, y, z, r
 from symplus.path import PathMonoid, TransformationPath
 
@@ -438,6 +439,9 @@ class AffineTransformation(Transformation):
         vector = -trans.matrix.inv() * trans.vector
         return AffineTransformation(matrix, vector)
 
+    def as_numeric(self):
+        return as_numeric(self)
+
 class EuclideanTransformation(AffineTransformation):
     is_invertible = True
     is_continuous = True
@@ -490,7 +494,7 @@ class EuclideanTransformation(AffineTransformation):
 
     def call(self, *args):
         vec = Mat(args)
-        res = simplify(qrotate(self.rquat, self.parity*vec) + self.tvec)
+        res = cached_simplify(qrotate(self.rquat, self.parity*vec) + self.tvec)
         return Tuple(*res)
 
     def _compose(trans1, trans2):
@@ -511,6 +515,134 @@ class EuclideanTransformation(AffineTransformation):
         parity = trans.parity
         return EuclideanTransformation(tvec, rquat, parity)
 
+
+# numeric transformation
+
+class NumericTransformation(object):
+    """
+    float-backed affine transformation as 4x4 augmented `numpy` array, which
+    is applied to points and composed without sympy.  it is obtained by
+    `as_numeric` of `AffineTransformation`, and converted back by
+    `as_symbolic`.  it is immutable, since `as_numeric` shares its results.
+
+    >>> from sympy import *
+    >>> from symplus.strplus import init_mprinting
+    >>> init_mprinting()
+    >>> m = rotation(pi/2, k).as_numeric()
+    >>> (m([[1,0,0],[0,0,2]]).round(6) + 0.0).tolist()
+    [[0.0, 1.0, 0.0], [0.0, 0.0, 2.0]]
+    >>> n = (translation([1,2,3]).as_numeric() * m).inv()
+    >>> (n([1,2,3]).round(6) + 0.0).tolist()
+    [0.0, 0.0, 0.0]
+    >>> s = n.as_symbolic()
+    >>> isinstance(s, EuclideanTransformation), list(s.tvec)
+    (True, [-2.0, 1.0, -3.0])
+    >>> m.augmat[0,3] = 1.0
+    Traceback (most recent call last):
+        ...
+    ValueError: assignment destination is read-only
+    """
+    def __init__(self, augmat, is_euclidean=False):
+        import numpy
+        self.augmat = numpy.array(augmat, dtype=float)
+        self.augmat.setflags(write=False)
+        self.is_euclidean = is_euclidean
+
+    @property
+    def matrix(self):
+        return self.augmat[:3,:3]
+
+    @property
+    def vector(self):
+        return self.augmat[:3,3]
+
+    def __call__(self, points):
+        """
+        apply to point `(3,)` or points `(N,3)`.
+        """
+        import numpy
+        points = numpy.asarray(points, dtype=float)
+        return points.dot(self.matrix.T) + self.vector
+
+    def __mul__(self, other):
+        if not isinstance(other, NumericTransformation):
+            return NotImplemented
+        return NumericTransformation(self.augmat.dot(other.augmat),
+                                     self.is_euclidean and other.is_euclidean)
+
+    def compose(self, other):
+        return self * other
+
+    def inv(self):
+        import numpy
+        if self.is_euclidean:
+            augmat = numpy.eye(4)
+            augmat[:3,:3] = self.matrix.T
+            augmat[:3,3] = -self.matrix.T.dot(self.vector)
+            return NumericTransformation(augmat, True)
+        else:
+            return NumericTransformation(numpy.linalg.inv(self.augmat))
+
+    def as_symbolic(self):
+        import numpy
+        mat = self.matrix
+        vec = Mat(self.vector.tolist())
+        if not self.is_euclidean:
+            return AffineTransformation(Mat(mat.tolist()), vec)
+        parity = 1 if numpy.linalg.det(mat) > 0 else -1
+        return EuclideanTransformation(vec, Mat(_rmat2rquat_numeric(mat*parity)), parity)
+
+    def __repr__(self):
+        return "%s(%r, %r)"%(type(self).__name__, self.augmat.tolist(), self.is_euclidean)
+
+def _rmat2rquat_numeric(rmat):
+    from math import sqrt
+    tr = rmat[0,0] + rmat[1,1] + rmat[2,2]
+    if tr > 0:
+        s = sqrt(1+tr)*2
+        q = [s/4,
+             (rmat[2,1]-rmat[1,2])/s,
+             (rmat[0,2]-rmat[2,0])/s,
+             (rmat[1,0]-rmat[0,1])/s]
+    else:
+        n = max(range(3), key=lambda n: rmat[n,n])
+        n1, n2 = (n+1)%3, (n+2)%3
+        s = sqrt(1+rmat[n,n]-rmat[n1,n1]-rmat[n2,n2])*2
+        q = [0.0]*4
+        q[0] = (rmat[n2,n1]-rmat[n1,n2])/s
+        q[n+1] = s/4
+        q[n1+1] = (rmat[n1,n]+rmat[n,n1])/s
+        q[n2+1] = (rmat[n2,n]+rmat[n,n2])/s
+    return [float(v) for v in q]
+
+def _rquat2rmat_numeric(q):
+    import numpy
+    w, x, y, z = q
+    return numpy.array([
+        [1-2*(y*y+z*z), 2*(x*y-w*z), 2*(x*z+w*y)],
+        [2*(x*y+w*z), 1-2*(x*x+z*z), 2*(y*z-w*x)],
+        [2*(x*z-w*y), 2*(y*z+w*x), 1-2*(x*x+y*y)]])
+
+@lru_cache(maxsize=1024)
+def as_numeric(trans):
+    """
+    lower affine transformation `trans` to `NumericTransformation`.
+    raise TypeError if `trans` is not numeric.
+    """
+    import numpy
+    augmat = numpy.eye(4)
+    if isinstance(trans, EuclideanTransformation):
+        q = [float(v) for v in trans.rquat]
+        augmat[:3,:3] = _rquat2rmat_numeric(q) * float(trans.parity)
+        augmat[:3,3] = [float(v) for v in trans.tvec]
+        return NumericTransformation(augmat, True)
+    elif isinstance(trans, AffineTransformation):
+        augmat[:3,:3] = [[float(v) for v in trans.matrix.row(n)] for n in range(3)]
+        augmat[:3,3] = [float(v) for v in trans.vector]
+        return NumericTransformation(augmat)
+    else:
+        raise TypeError
+
 # transformation group
 
 class TransformationGroup(with_metaclass(Singleton, Set)):
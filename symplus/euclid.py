@@ -1,15 +1,141 @@
-from sympy.core import Basic, S, sympify, symbols
-from sympy.core.compatibility import with_metaclass
+import math
+from contextlib import contextmanager
+from sympy.core import Basic, S, Float, sympify, symbols
+from sympy.core.compatibility import with_metaclass, lru_cache
 from sympy.core.singleton import Singleton
-from sympy.simplify import simplify
 from sympy.logic import false, true
 from sympy.sets import Set, Intersection, Union, Complement, EmptySet
 from sympy.matrices import eye
 from symplus.typlus import is_Tuple
+from symplus.simplus import cached_simplify, canonicalize_radical
 from symplus.strplus import mstr_inline_Matrix
-from symplus.setplus import AbstractSet, as_abstract, NaturalTopology, AbsoluteComplement, Exterior
+from symplus.setplus import (AbstractSet, as_abstract, as_predicate, NaturalTopology,
+    AbsoluteComplement, Exterior)
 from symplus.matplus import Mat, norm, normalize, dot, cross, project, i, j, k, x, y, z, r
-from symplus.affine import EuclideanTransformation, qrotate
+from symplus.affine import EuclideanTransformation, qrotate, rquat2rmat, as_numeric
+
+
+def _floats(vec):
+    return [float(v) for v in vec]
+
+
+# numeric mode
+
+_tolerance = None
+
+def set_numeric_mode(tolerance=1e-9):
+    """
+    switch parameters of primitives to floats, which are snapped to multiples
+    of `tolerance`, so primitives equal up to `tolerance` are equal and have
+    the same hash, and the image under numeric euclidean transformation is
+    computed by float operations instead of `simplify`.  switch back to exact
+    mode if `tolerance` is None.
+
+    snapping is rounding to the nearest multiple, so values closer than
+    `tolerance` may still be snapped apart if they straddle a midpoint
+    between two multiples; equality is then missed (never wrongly claimed),
+    which costs only duplicated work of simplification.
+
+    >>> with numeric_mode(1e-6):
+    ...     print(Sphere(1, [0.1e-6,0,0]) == Sphere(1, [0.4e-6,0,0]))
+    ...     print(Sphere(1, [0.4999999e-6,0,0]) == Sphere(1, [0.5000001e-6,0,0]))
+    True
+    False
+    """
+    global _tolerance
+    _tolerance = tolerance
+
+def get_numeric_mode():
+    return _tolerance
+
+@contextmanager
+def numeric_mode(tolerance=1e-9):
+    """
+    >>> from sympy import pi
+    >>> from symplus.setplus import Image
+    >>> from symplus.affine import rotation
+    >>> t = rotation(pi/4, [1,0,0])
+    >>> with numeric_mode(1e-6):
+    ...     h = Image(t, Image(t, Halfspace(1, [0,1,0])))
+    >>> h == Halfspace(1, [0,0,1])
+    True
+    >>> get_numeric_mode() is None
+    True
+    """
+    tolerance_ = _tolerance
+    set_numeric_mode(tolerance)
+    try:
+        yield
+    finally:
+        set_numeric_mode(tolerance_)
+
+def _snap(val):
+    # round to the nearest multiple of tolerance; see `set_numeric_mode` for
+    # values near the midpoint
+    try:
+        val = float(val)
+    except TypeError:
+        return val
+    return Float(round(val/_tolerance)*_tolerance + 0.0)
+
+def _num(expr):
+    # snap parameter in numeric mode
+    if _tolerance is None:
+        return expr
+    if hasattr(expr, 'applyfunc'):
+        return expr.applyfunc(_snap)
+    return _snap(expr)
+
+def _simp(expr):
+    if _tolerance is None:
+        return cached_simplify(expr)
+    return _num(expr)
+
+def _rotate(func, mat):
+    # rotate vector or columns of matrix by euclidean transformation `func`
+    if _tolerance is not None:
+        try:
+            rmat = as_numeric(func).matrix
+            return _num(Mat(rmat.dot([_floats(mat.row(n)) for n in range(mat.rows)]).tolist()))
+        except TypeError:
+            pass
+    if mat.cols == 1:
+        return cached_simplify(qrotate(func.rquat, func.parity*mat))
+    else:
+        return cached_simplify(rquat2rmat(func.rquat)*func.parity*mat)
+
+def _move(func, point):
+    if _tolerance is not None:
+        try:
+            return _num(Mat(as_numeric(func)(_floats(point)).tolist()))
+        except TypeError:
+            pass
+    return func.call(*point)
+
+
+# canonical form
+
+@lru_cache(maxsize=4096)
+def canonicalize(zet):
+    """
+    rebuild primitives in `zet` with parameters in canonical form by
+    `canonicalize_radical`, so that primitives moved many times keep bounded
+    size, and equal primitives have the same structure.
+
+    >>> from sympy import sqrt
+    >>> from symplus.strplus import init_mprinting
+    >>> init_mprinting()
+    >>> canonicalize(Sphere(sqrt(2*sqrt(5) + 10)))
+    Sphere(sqrt(2)*sqrt(sqrt(5) + 5), [0 0 0]', False)
+    """
+    prims = zet.atoms(EuclideanSpace)
+    return zet.xreplace(dict((prim, _canonicalize_primitive(prim)) for prim in prims))
+
+def _canonicalize_primitive(zet):
+    args = [canonicalize_radical(arg) for arg in zet.args]
+    if args == list(zet.args):
+        return zet
+    return Basic.__new__(type(zet), *args)
 
 
 # primitive sets
@@ -18,8 +144,8 @@ class EuclideanSpace(Set):
     def _complement(self, other):
         if hasattr(self, '_absolute_complement'):
             self_ = self._absolute_complement()
-        if self_ is not None:
-            return Intersection(self_, other, evaluate=True)
+            if self_ is not None:
+                return Intersection(self_, other, evaluate=True)
 
     def _union(self, other):
         if isinstance(other, WholeSpace):
@@ -77,6 +203,12 @@ class WholeSpace(with_metaclass(Singleton, EuclideanSpace)):
     def as_abstract(self):
         return AbstractSet(symbols('x y z', real=True), true)
 
+    def as_predicate(self):
+        def pred(points):
+            import numpy
+            return numpy.ones(len(points), dtype=bool)
+        return pred
+
     @property
     def interior(self):
         return self
@@ -115,12 +247,12 @@ class Halfspace(AlgebraicEuclideanSpace):
         False
         """
         normalization = kwargs.pop("normalization", True)
-        offset = sympify(offset)
-        direction = Mat(direction)
+        offset = _num(sympify(offset))
+        direction = _num(Mat(direction))
         if normalization:
             if norm(direction) == 0:
                 raise ValueError
-            direction = simplify(normalize(direction))
+            direction = _simp(normalize(direction))
         closed = sympify(bool(closed))
         return Basic.__new__(cls, offset, direction, closed)
 
@@ -154,8 +286,8 @@ class Halfspace(AlgebraicEuclideanSpace):
 
     def _image(self, func):
         if isinstance(func, EuclideanTransformation):
-            direction = simplify(qrotate(func.rquat, func.parity*self.direction))
-            offset = simplify(self.offset + dot(func.tvec, direction))
+            direction = _rotate(func, self.direction)
+            offset = _simp(self.offset + dot(func.tvec, direction))
             closed = self.closed
             return Halfspace(
                 offset=offset,
@@ -179,6 +311,27 @@ class Halfspace(AlgebraicEuclideanSpace):
             expr = dot(r, self.direction) > self.offset
         return AbstractSet((x,y,z), expr)
 
+    def as_predicate(self):
+        import numpy
+        offset = float(self.offset)
+        direction = numpy.array(list(self.direction), dtype=float)
+        closed = bool(self.closed)
+        def pred(points):
+            s = numpy.asarray(points, dtype=float).dot(direction)
+            return s >= offset if closed else s > offset
+        return pred
+
+    def _bounding_box(self):
+        offset = float(self.offset)
+        direction = _floats(self.direction)
+        box = [(-math.inf, math.inf)]*3
+        for n in range(3):
+            if direction[n] == 1:
+                box[n] = (offset, math.inf)
+            elif direction[n] == -1:
+                box[n] = (-math.inf, -offset)
+        return tuple(box)
+
     def _absolute_complement(self):
         """
         >>> from sympy import *
@@ -238,8 +391,8 @@ class Sphere(AlgebraicEuclideanSpace, BoundedEuclideanSpace):
         >>> Sphere(3, [1,0,2]).contains((1,1,1))
         True
         """
-        radius = sympify(abs(radius))
-        center = Mat(center)
+        radius = _num(sympify(abs(radius)))
+        center = _num(Mat(center))
         closed = sympify(bool(closed))
         return Basic.__new__(cls, radius, center, closed)
 
@@ -275,7 +428,7 @@ class Sphere(AlgebraicEuclideanSpace, BoundedEuclideanSpace):
     def _image(self, func):
         if isinstance(func, EuclideanTransformation):
             radius = self.radius
-            center = func.call(*self.center)
+            center = _move(func, self.center)
             closed = self.closed
             return Sphere(
                 radius=radius,
@@ -299,6 +452,21 @@ class Sphere(AlgebraicEuclideanSpace, BoundedEuclideanSpace):
             expr = norm(r-self.center)**2 < self.radius**2
         return AbstractSet((x,y,z), expr)
 
+    def as_predicate(self):
+        import numpy
+        radius2 = float(self.radius)**2
+        center = numpy.array(list(self.center), dtype=float)
+        closed = bool(self.closed)
+        def pred(points):
+            p = numpy.asarray(points, dtype=float) - center
+            s = (p*p).sum(axis=-1)
+            return s <= radius2 if closed else s < radius2
+        return pred
+
+    def _bounding_box(self):
+        radius = float(self.radius)
+        return tuple((c-radius, c+radius) for c in _floats(self.center))
+
     @property
     def interior(self):
         return Sphere(
@@ -339,16 +507,16 @@ class InfiniteCylinder(AlgebraicEuclideanSpace):
         True
         """
         normalization = kwargs.pop("normalization", True)
-        radius = sympify(abs(radius))
-        direction = Mat(direction)
+        radius = _num(sympify(abs(radius)))
+        direction = _num(Mat(direction))
         if normalization:
             if norm(direction) == 0:
                 raise ValueError
-            direction = simplify(normalize(direction))
+            direction = _simp(normalize(direction))
         direction = max(direction, -direction, key=direction.compare)
-        center = Mat(center)
+        center = _num(Mat(center))
         if normalization:
-            center = simplify(center - project(center, direction))
+            center = _simp(center - project(center, direction))
         closed = sympify(bool(closed))
         return Basic.__new__(cls, radius, center, direction, closed)
 
@@ -389,9 +557,9 @@ class InfiniteCylinder(AlgebraicEuclideanSpace):
     def _image(self, func):
         if isinstance(func, EuclideanTransformation):
             radius = self.radius
-            direction = simplify(qrotate(func.rquat, func.parity*self.direction))
-            center = simplify(qrotate(func.rquat, func.parity*self.center))
-            center = simplify(center + func.tvec - project(func.tvec, direction))
+            direction = _rotate(func, self.direction)
+            center = _rotate(func, self.center)
+            center = _simp(center + func.tvec - project(func.tvec, direction))
             closed = self.closed
             return InfiniteCylinder(
                 radius=radius,
@@ -417,6 +585,23 @@ class InfiniteCylinder(AlgebraicEuclideanSpace):
             expr = norm(cross(p, self.direction))**2 < self.radius**2
         return AbstractSet((x,y,z), expr)
 
+    def as_predicate(self):
+        import numpy
+        radius2 = float(self.radius)**2
+        center = numpy.array(list(self.center), dtype=float)
+        direction = numpy.array(list(self.direction), dtype=float)
+        closed = bool(self.closed)
+        def pred(points):
+            c = numpy.cross(numpy.asarray(points, dtype=float) - center, direction)
+            s = (c*c).sum(axis=-1)
+            return s <= radius2 if closed else s < radius2
+        return pred
+
+    def _bounding_box(self):
+        radius = float(self.radius)
+        return tuple((c-radius, c+radius) if d == 0 else (-math.inf, math.inf)
+                     for c, d in zip(_floats(self.center), _floats(self.direction)))
+
     @property
     def interior(self):
         return InfiniteCylinder(
@@ -459,13 +644,13 @@ class SemiInfiniteCone(AlgebraicEuclideanSpace):
         False
         """
         normalization = kwargs.pop("normalization", True)
-        slope = sympify(abs(slope))
-        center = Mat(center)
-        direction = Mat(direction)
+        slope = _num(sympify(abs(slope)))
+        center = _num(Mat(center))
+        direction = _num(Mat(direction))
         if normalization:
             if norm(direction) == 0:
                 raise ValueError
-            direction = simplify(normalize(direction))
+            direction = _simp(normalize(direction))
         closed = sympify(bool(closed))
         return Basic.__new__(cls, slope, center, direction, closed)
 
@@ -506,8 +691,8 @@ class SemiInfiniteCone(AlgebraicEuclideanSpace):
     def _image(self, func):
         if isinstance(func, EuclideanTransformation):
             slope = self.slope
-            center = func.call(*self.center)
-            direction = simplify(qrotate(func.rquat, func.parity*self.direction))
+            center = _move(func, self.center)
+            direction = _rotate(func, self.direction)
             closed = self.closed
             return SemiInfiniteCone(
                 slope=slope,
@@ -533,6 +718,31 @@ class SemiInfiniteCone(AlgebraicEuclideanSpace):
             expr = norm(cross(p, self.direction)) < self.slope*dot(p, self.direction)
         return AbstractSet((x,y,z), expr)
 
+    def as_predicate(self):
+        import numpy
+        slope = float(self.slope)
+        center = numpy.array(list(self.center), dtype=float)
+        direction = numpy.array(list(self.direction), dtype=float)
+        closed = bool(self.closed)
+        def pred(points):
+            p = numpy.asarray(points, dtype=float) - center
+            c = numpy.sqrt((numpy.cross(p, direction)**2).sum(axis=-1))
+            h = slope*p.dot(direction)
+            return c <= h if closed else c < h
+        return pred
+
+    def _bounding_box(self):
+        # the cone is bounded below along axis if the angle between axis and
+        # the cone is within right angle
+        alpha = math.atan(float(self.slope))
+        box = []
+        for c, d in zip(_floats(self.center), _floats(self.direction)):
+            th = math.acos(max(-1.0, min(1.0, d)))
+            lo = c if th + alpha <= math.pi/2 else -math.inf
+            hi = c if math.pi - th + alpha <= math.pi/2 else math.inf
+            box.append((lo, hi))
+        return tuple(box)
+
     @property
     def interior(self):
         return SemiInfiniteCone(
@@ -596,11 +806,10 @@ class Revolution(AlgebraicEuclideanSpace):
 
     def _image(self, func):
         if isinstance(func, EuclideanTransformation):
-            func = self.func
-            center = func.call(*self.center)
-            direction = simplify(qrotate(func.rquat, func.parity*self.direction))
+            center = _move(func, self.center)
+            direction = _rotate(func, self.direction)
             return Revolution(
-                func=func,
+                func=self.func,
                 center=center,
                 direction=direction,
                 normalization=False)
@@ -621,9 +830,9 @@ class Revolution(AlgebraicEuclideanSpace):
 
 class Box(BoundedEuclideanSpace):
     def __new__(cls, size=[2,2,2], center=[0,0,0], orientation=eye(3), closed=False, **kwargs):
-        size = Mat([abs(size[0]), abs(size[1]), abs(size[2])])
-        center = Mat(center)
-        orientation = Mat(orientation)
+        size = _num(Mat([abs(size[0]), abs(size[1]), abs(size[2])]))
+        center = _num(Mat(center))
+        orientation = _num(Mat(orientation))
         closed = sympify(bool(closed))
         return Basic.__new__(cls, size, center, orientation, closed)
 
@@ -664,13 +873,14 @@ class Box(BoundedEuclideanSpace):
         j = self.orientation[:,1]
         k = self.orientation[:,2]
         offset = -self.size/sympify(2)
+        coffset = [dot(self.center, i), dot(self.center, j), dot(self.center, k)]
         return Intersection(
-            Halfspace(offset=offset[0], direction= i, closed=self.closed, normalization=False),
-            Halfspace(offset=offset[1], direction= j, closed=self.closed, normalization=False),
-            Halfspace(offset=offset[2], direction= k, closed=self.closed, normalization=False),
-            Halfspace(offset=offset[0], direction=-i, closed=self.closed, normalization=False),
-            Halfspace(offset=offset[1], direction=-j, closed=self.closed, normalization=False),
-            Halfspace(offset=offset[2], direction=-k, closed=self.closed, normalization=False))
+            Halfspace(offset=offset[0]+coffset[0], direction= i, closed=self.closed, normalization=False),
+            Halfspace(offset=offset[1]+coffset[1], direction= j, closed=self.closed, normalization=False),
+            Halfspace(offset=offset[2]+coffset[2], direction= k, closed=self.closed, normalization=False),
+            Halfspace(offset=offset[0]-coffset[0], direction=-i, closed=self.closed, normalization=False),
+            Halfspace(offset=offset[1]-coffset[1], direction=-j, closed=self.closed, normalization=False),
+            Halfspace(offset=offset[2]-coffset[2], direction=-k, closed=self.closed, normalization=False))
 
     def _contains(self, other):
         return self.as_algebraic()._contains(other)
@@ -678,8 +888,8 @@ class Box(BoundedEuclideanSpace):
     def _image(self, func):
         if isinstance(func, EuclideanTransformation):
             size = self.size
-            center = func.call(*self.center)
-            orientation = simplify(rquat2rmat(func.rquat)*func.parity*self.orientation)
+            center = _move(func, self.center)
+            orientation = _rotate(func, self.orientation)
             closed = self.closed
             return Box(
                 size=size,
@@ -691,6 +901,16 @@ class Box(BoundedEuclideanSpace):
     def as_abstract(self):
         return as_abstract(self.as_algebraic())
 
+    def as_predicate(self):
+        return as_predicate(self.as_algebraic())
+
+    def _bounding_box(self):
+        size = _floats(self.size)
+        center = _floats(self.center)
+        orientation = [_floats(self.orientation.row(n)) for n in range(3)]
+        ext = [sum(abs(o)*s/2 for o, s in zip(row, size)) for row in orientation]
+        return tuple((c-e, c+e) for c, e in zip(center, ext))
+
     @property
     def interior(self):
         return Box(
@@ -720,14 +940,14 @@ class Box(BoundedEuclideanSpace):
 class Cylinder(BoundedEuclideanSpace):
     def __new__(cls, radius=1, height=2, center=[0,0,0], direction=[0,0,1], closed=False, **kwargs):
         normalization = kwargs.pop("normalization", True)
-        radius = sympify(abs(radius))
-        height = sympify(abs(height))
-        center = Mat(center)
-        direction = Mat(direction)
+        radius = _num(sympify(abs(radius)))
+        height = _num(sympify(abs(height)))
+        center = _num(Mat(center))
+        direction = _num(Mat(direction))
         if normalization:
             if norm(direction) == 0:
                 raise ValueError
-            direction = simplify(normalize(direction))
+            direction = _simp(normalize(direction))
         direction = max(direction, -direction, key=direction.compare)
         closed = sympify(bool(closed))
         return Basic.__new__(cls, radius, height, center, direction, closed)
@@ -762,7 +982,7 @@ class Cylinder(BoundedEuclideanSpace):
             printer.doprint(self.closed))
 
     def as_algebraic(self):
-        center = simplify(self.center - project(self.center, self.direction))
+        center = _simp(self.center - project(self.center, self.direction))
         coffset = dot(self.center, self.direction)
         return Intersection(
             InfiniteCylinder(
@@ -789,8 +1009,8 @@ class Cylinder(BoundedEuclideanSpace):
         if isinstance(func, EuclideanTransformation):
             radius = self.radius
             height = self.height
-            center = func.call(*self.center)
-            direction = simplify(qrotate(func.rquat, func.parity*self.direction))
+            center = _move(func, self.center)
+            direction = _rotate(func, self.direction)
             closed = self.closed
             return Cylinder(
                 radius=radius,
@@ -803,6 +1023,15 @@ class Cylinder(BoundedEuclideanSpace):
     def as_abstract(self):
         return as_abstract(self.as_algebraic())
 
+    def as_predicate(self):
+        return as_predicate(self.as_algebraic())
+
+    def _bounding_box(self):
+        radius = float(self.radius)
+        height = float(self.height)
+        ext = [height/2*abs(d) + radius*math.sqrt(max(0.0, 1-d**2)) for d in _floats(self.direction)]
+        return tuple((c-e, c+e) for c, e in zip(_floats(self.center), ext))
+
     @property
     def interior(self):
         return Cylinder(
@@ -834,16 +1063,16 @@ class Cylinder(BoundedEuclideanSpace):
 class Cone(BoundedEuclideanSpace):
     def __new__(cls, radius=1, height=1, center=[0,0,0], direction=[0,0,1], closed=False, **kwargs):
         normalization = kwargs.pop("normalization", True)
-        radius = sympify(abs(radius))
+        radius = _num(sympify(abs(radius)))
         if height < 0:
             direction = -direction
-        direction = Mat(direction)
+        direction = _num(Mat(direction))
         if normalization:
             if norm(direction) == 0:
                 raise ValueError
-            direction = simplify(normalize(direction))
-        height = sympify(abs(height))
-        center = Mat(center)
+            direction = _simp(normalize(direction))
+        height = _num(sympify(abs(height)))
+        center = _num(Mat(center))
         closed = sympify(bool(closed))
         return Basic.__new__(cls, radius, height, center, direction, closed)
 
@@ -898,8 +1127,8 @@ class Cone(BoundedEuclideanSpace):
         if isinstance(func, EuclideanTransformation):
             radius = self.radius
             height = self.height
-            center = func.call(*self.center)
-            direction = simplify(qrotate(func.rquat, func.parity*self.direction))
+            center = _move(func, self.center)
+            direction = _rotate(func, self.direction)
             closed = self.closed
             return Cone(
                 radius=radius,
@@ -912,6 +1141,20 @@ class Cone(BoundedEuclideanSpace):
     def as_abstract(self):
         return as_abstract(self.as_algebraic())
 
+    def as_predicate(self):
+        return as_predicate(self.as_algebraic())
+
+    def _bounding_box(self):
+        # union of the apex and the base disk
+        radius = float(self.radius)
+        height = float(self.height)
+        box = []
+        for c, d in zip(_floats(self.center), _floats(self.direction)):
+            b = c + height*d
+            e = radius*math.sqrt(max(0.0, 1-d**2))
+            box.append((min(c, b-e), max(c, b+e)))
+        return tuple(box)
+
     @property
     def interior(self):
         return Cone(
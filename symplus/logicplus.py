@@ -106,3 +106,129 @@ class Exist(Application, Boolean):
         return satisfiable(self)
     __nonzero__=__bool__
 
+
+
+# binary decision diagram
+
+class BDD(object):
+    """
+    reduced ordered binary decision diagram.  node is int: `0` and `1` are
+    terminals, and other node `u` is `nodes[u] == (var, low, high)`, which is
+    hash-consed by table `unique`, so equivalent functions are the same node.
+    variables are ints, ordered by value.
+
+    >>> bdd = BDD()
+    >>> a, b, c = bdd.var(0), bdd.var(1), bdd.var(2)
+    >>> bdd.apply_or(bdd.apply_and(a, b), bdd.apply_and(a, bdd.apply_not(b))) == a
+    True
+    >>> f = bdd.apply_or(bdd.apply_and(a, b), bdd.apply_and(bdd.apply_not(a), c))
+    >>> bdd.isop(bdd.apply_or(f, bdd.apply_and(b, c)))
+    [((0, False), (2, True)), ((0, True), (1, True))]
+    >>> bdd.count(f, 3)
+    4
+    """
+    def __init__(self):
+        self.nodes = [None, None]
+        self.unique = {}
+        self._cache = {}
+
+    def node(self, var, low, high):
+        if low == high:
+            return low
+        key = (var, low, high)
+        u = self.unique.get(key)
+        if u is None:
+            u = self.unique[key] = len(self.nodes)
+            self.nodes.append(key)
+        return u
+
+    def var(self, var):
+        return self.node(var, 0, 1)
+
+    def top(self, *us):
+        return min(self.nodes[u][0] for u in us if u > 1)
+
+    def cofactors(self, u, var):
+        if u <= 1 or self.nodes[u][0] != var:
+            return u, u
+        return self.nodes[u][1], self.nodes[u][2]
+
+    def apply_not(self, u):
+        if u <= 1:
+            return 1-u
+        key = ('not', u)
+        if key not in self._cache:
+            var, low, high = self.nodes[u]
+            self._cache[key] = self.node(var, self.apply_not(low), self.apply_not(high))
+        return self._cache[key]
+
+    def apply_and(self, u, v):
+        if u == 0 or v == 0:
+            return 0
+        if u == 1 or u == v:
+            return v
+        if v == 1:
+            return u
+        key = ('and', min(u, v), max(u, v))
+        if key not in self._cache:
+            var = self.top(u, v)
+            u0, u1 = self.cofactors(u, var)
+            v0, v1 = self.cofactors(v, var)
+            self._cache[key] = self.node(var, self.apply_and(u0, v0), self.apply_and(u1, v1))
+        return self._cache[key]
+
+    def apply_or(self, u, v):
+        if u == 1 or v == 1:
+            return 1
+        if u == 0 or u == v:
+            return v
+        if v == 0:
+            return u
+        key = ('or', min(u, v), max(u, v))
+        if key not in self._cache:
+            var = self.top(u, v)
+            u0, u1 = self.cofactors(u, var)
+            v0, v1 = self.cofactors(v, var)
+            self._cache[key] = self.node(var, self.apply_or(u0, v0), self.apply_or(u1, v1))
+        return self._cache[key]
+
+    def count(self, u, nvars):
+        """
+        number of satisfying assignments of `nvars` variables.
+        """
+        def count(u, level):
+            if u <= 1:
+                return u * 2**(nvars-level)
+            var, low, high = self.nodes[u]
+            return 2**(var-level) * (count(low, var+1) + count(high, var+1))
+        return count(u, 0)
+
+    def isop(self, lower, upper=None):
+        """
+        irredundant sum of products between `lower` and `upper` by the
+        Minato-Morreale algorithm; each product is tuple of `(var, value)`.
+        """
+        if upper is None:
+            upper = lower
+        return self._isop(lower, upper)[0]
+
+    def _isop(self, lower, upper):
+        if lower == 0:
+            return [], 0
+        if upper == 1:
+            return [()], 1
+        key = ('isop', lower, upper)
+        if key not in self._cache:
+            var = self.top(lower, upper)
+            l0, l1 = self.cofactors(lower, var)
+            u0, u1 = self.cofactors(upper, var)
+            cubes0, f0 = self._isop(self.apply_and(l0, self.apply_not(u1)), u0)
+            cubes1, f1 = self._isop(self.apply_and(l1, self.apply_not(u0)), u1)
+            ld = self.apply_or(self.apply_and(l0, self.apply_not(f0)),
+                               self.apply_and(l1, self.apply_not(f1)))
+            cubesd, fd = self._isop(ld, self.apply_and(u0, u1))
+            f = self.node(var, self.apply_or(f0, fd), self.apply_or(f1, fd))
+            cubes = ([((var, False),) + cube for cube in cubes0] +
+                     [((var, True),) + cube for cube in cubes1] + cubesd)
+            self._cache[key] = cubes, f
+        return self._cache[key]
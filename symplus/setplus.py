@@ -1,5 +1,6 @@
 import operator
 from functools import reduce
+from sympy.core.compatibility import lru_cache
 from sympy.core import S, Basic, Atom, Symbol, Dummy, sympify, Ne, Eq, Gt, Ge, Lt, Le, oo, symbols
 from sympy.core.function import Application
 from sympy.core.evaluate import global_evaluate
@@ -10,7 +11,8 @@ from sympy.sets import Set, Interval, FiniteSet, Intersection, Union, Complement
 from symplus.typlus import (is_Symbol, is_Function, is_Boolean, type_match, FunctionObject, pack_if_not,
                             unpack_if_can, repack_if_can, free_symbols, rename_variables_in)
 from symplus.funcplus import FunctionCompose, FunctionInverse, as_lambda, nres
-from symplus.logicplus import Forall
+from symplus.logicplus import Forall, BDD
+from symplus.util import LRUCache
 
 
 class AbstractSet(Set):
@@ -777,8 +779,14 @@ class Contains(Application, Boolean):
         if not isinstance(ret, Contains):
             return ret
 
-def simplify_boolean(expr, form='dnf', op=(Union, Intersection, AbsoluteComplement, Complement)):
+def simplify_boolean(expr, form='dnf', op=(Union, Intersection, AbsoluteComplement, Complement),
+                     threshold=8):
     """
+    simplify set expression `expr` built by `op` as boolean function of its
+    other subexpressions (atoms).  if there are more than `threshold` atoms,
+    use irredundant sum of products of BDD instead of `simplify_logic`, which
+    is exponential in number of atoms.
+
     >>> from sympy import *
     >>> from symplus.strplus import init_mprinting
     >>> init_mprinting()
@@ -791,8 +799,25 @@ def simplify_boolean(expr, form='dnf', op=(Union, Intersection, AbsoluteCompleme
     Set(A) u Set(C)
     >>> simplify_boolean(AbsoluteComplement(A+B+C) | (C-A-B))
     -(Set(A)) n -(Set(B))
+    >>> simplify_boolean((A & B) | (A - B) | (B & C) | (C - B), threshold=0)
+    Set(A) u Set(C)
     """
-    exprs = {}
+    atoms = {}
+    exprs = []
+
+    def atom(expr):
+        # index atoms by structural hash
+        if expr not in atoms:
+            atoms[expr] = len(exprs)
+            exprs.append(expr)
+        return atoms[expr]
+
+    def collect(expr):
+        if isinstance(expr, tuple(op)):
+            for arg in expr.args:
+                collect(arg)
+        else:
+            atom(expr)
 
     def expr2bool(expr):
         if isinstance(expr, op[0]):
@@ -804,13 +829,7 @@ def simplify_boolean(expr, form='dnf', op=(Union, Intersection, AbsoluteCompleme
         elif len(op) >= 4 and isinstance(expr, op[3]):
             return And(expr2bool(expr.args[0]), Not(expr2bool(expr.args[1])))
         else:
-            for b, e in exprs.items():
-                if e == expr:
-                    return b
-            else:
-                b = Dummy("b")
-                exprs[b] = expr
-                return b
+            return bools[atom(expr)]
 
     def bool2expr(b):
         if isinstance(b, Or):
@@ -819,9 +838,44 @@ def simplify_boolean(expr, form='dnf', op=(Union, Intersection, AbsoluteCompleme
             return op[1](*map(bool2expr, b.args), evaluate=False)
         elif isinstance(b, Not):
             return op[2](bool2expr(b.args[0]), evaluate=False)
+        elif b == true:
+            return S.UniversalSet
+        elif b == false:
+            return S.EmptySet
         else:
-            return exprs[b]
+            return exprs[indices[b]]
 
+    def expr2bdd(expr):
+        if isinstance(expr, op[0]):
+            return reduce(bdd.apply_or, map(expr2bdd, expr.args))
+        elif isinstance(expr, op[1]):
+            return reduce(bdd.apply_and, map(expr2bdd, expr.args))
+        elif isinstance(expr, op[2]):
+            return bdd.apply_not(expr2bdd(expr.args[0]))
+        elif len(op) >= 4 and isinstance(expr, op[3]):
+            return bdd.apply_and(expr2bdd(expr.args[0]), bdd.apply_not(expr2bdd(expr.args[1])))
+        else:
+            return bdd.var(atom(expr))
+
+    def cubes2expr(cubes):
+        if not cubes:
+            return S.EmptySet
+        terms = []
+        for cube in cubes:
+            lits = [exprs[var] if value else op[2](exprs[var], evaluate=False)
+                    for var, value in cube]
+            if not lits:
+                return S.UniversalSet
+            terms.append(lits[0] if len(lits) == 1 else op[1](*lits, evaluate=False))
+        return terms[0] if len(terms) == 1 else op[0](*terms, evaluate=False)
+
+    collect(expr)
+    if len(exprs) > threshold:
+        bdd = BDD()
+        return cubes2expr(bdd.isop(expr2bdd(expr)))
+
+    bools = [Dummy("b") for _ in exprs]
+    indices = dict((b, n) for n, b in enumerate(bools))
     return bool2expr(simplify_logic(expr2bool(expr), form='dnf', deep=False))
 
 
@@ -1105,7 +1159,7 @@ def regularize(set, evaluate=False, closed=True):
 
     if isinstance(set, tuple(reg_table.keys())):
         func_ = reg_table[type(set)]
-        args_ = [regularize(arg, evaluate=evaluate) for arg in set.args]
+        args_ = [regularize(arg, evaluate=evaluate, closed=closed) for arg in set.args]
         return func_(*args_, evaluate=evaluate)
 
     elif isinstance(set, Complement):
@@ -1113,10 +1167,10 @@ def regularize(set, evaluate=False, closed=True):
             set.args[0],
             AbsoluteComplement(set.args[1], evaluate=False),
             evaluate=False)
-        return regularize(set_, evaluate=evaluate)
+        return regularize(set_, evaluate=evaluate, closed=closed)
 
     elif isinstance(set, Regularization):
-        return regularize(set.args[0], evaluate=evaluate)
+        return regularize(set.args[0], evaluate=evaluate, closed=closed)
 
     else:
         return Regularization(set, evaluate=evaluate)
@@ -1470,6 +1524,223 @@ class OpenRegularizedUnion(Set):
 
 # topology(open set definition)
 
+# compiled predicate
+
+@lru_cache(maxsize=1024)
+def as_predicate(zet):
+    """
+    compile set of points `zet` to vectorized predicate, which maps `(N, n)`
+    `numpy` array of points to boolean array of shape `(N,)`.
+    regularizations are ignored, since they only differ in boundary.
+
+    >>> from sympy import *
+    >>> x, y = symbols('x y')
+    >>> disk = AbstractSet((x, y), x**2+y**2 < 1)
+    >>> half = AbstractSet((x, y), x > 0)
+    >>> pred = as_predicate(Intersection(disk, AbsoluteComplement(half), evaluate=False))
+    >>> pred([[0.5, 0], [-0.5, 0], [-2, 0]]).tolist()
+    [False, True, False]
+    """
+    if hasattr(zet, 'as_predicate'):
+        return zet.as_predicate()
+
+    elif isinstance(zet, (Intersection, ClosedRegularizedIntersection, OpenRegularizedIntersection)):
+        preds = [as_predicate(arg) for arg in zet.args]
+        def pred(points):
+            return reduce(operator.and_, (pred_(points) for pred_ in preds))
+        return _vectorized(pred)
+
+    elif isinstance(zet, (Union, ClosedRegularizedUnion, OpenRegularizedUnion)):
+        preds = [as_predicate(arg) for arg in zet.args]
+        def pred(points):
+            return reduce(operator.or_, (pred_(points) for pred_ in preds))
+        return _vectorized(pred)
+
+    elif isinstance(zet, (AbsoluteComplement, ClosedRegularizedAbsoluteComplement,
+                          OpenRegularizedAbsoluteComplement)):
+        pred_ = as_predicate(zet.args[0])
+        return _vectorized(lambda points: ~pred_(points))
+
+    elif isinstance(zet, Complement):
+        pred1 = as_predicate(zet.args[0])
+        pred2 = as_predicate(zet.args[1])
+        return _vectorized(lambda points: pred1(points) & ~pred2(points))
+
+    elif isinstance(zet, (ClosedRegularization, OpenRegularization)):
+        return as_predicate(zet.args[0])
+
+    elif isinstance(zet, Image) and hasattr(zet.function, 'as_numeric'):
+        inv = zet.function.as_numeric().inv()
+        pred_ = as_predicate(zet.set)
+        return _vectorized(lambda points: pred_(inv(points)))
+
+    elif zet == S.EmptySet or zet == S.UniversalSet:
+        value = zet == S.UniversalSet
+        def pred(points):
+            import numpy
+            return numpy.full(len(points), value, dtype=bool)
+        return _vectorized(pred)
+
+    else:
+        from sympy.utilities import lambdify
+        zet_ = zet if isinstance(zet, AbstractSet) else as_abstract(zet)
+        if not isinstance(zet_, AbstractSet):
+            raise TypeError
+        var = zet_.variables
+        func = lambdify(var, zet_.expr, modules="numpy")
+        def pred(points):
+            import numpy
+            if len(var) == 1:
+                mask = func(points.T)
+            else:
+                mask = func(*points.T)
+            return numpy.broadcast_to(numpy.asarray(mask, dtype=bool), (len(points),))
+        return _vectorized(pred)
+
+def _vectorized(pred):
+    def pred_(points):
+        import numpy
+        points = numpy.asarray(points, dtype=float)
+        return pred(points)
+    return pred_
+
+
+# bounding box
+
+@lru_cache(maxsize=1024)
+def bounding_box(zet):
+    """
+    conservative axis-aligned bounding box of set of points `zet`, as tuple
+    of `(lo, hi)` for each axis, where infinite bound is `inf`; return None if
+    it is unbounded or unknown.  empty box has `lo > hi`.
+
+    >>> from sympy import *
+    >>> x, y = symbols('x y')
+    >>> a = AbstractSet((x, y), x**2+y**2 < 1)
+    >>> bounding_box(a) is None
+    True
+    >>> from symplus.euclid import Box, Cylinder, Sphere, Halfspace
+    >>> from symplus.affine import EuclideanTransformation, rquat
+    >>> bounding_box(Box(size=[2,4,6], center=[1,0,0]))
+    ((0.0, 2.0), (-2.0, 2.0), (-3.0, 3.0))
+    >>> bounding_box(Cylinder(height=4, direction=[1,0,0]))
+    ((-2.0, 2.0), (-1.0, 1.0), (-1.0, 1.0))
+    >>> t = EuclideanTransformation([1,2,3], rquat(pi/4, [0,0,1]))
+    >>> tuple((round(lo, 6), round(hi, 6)) for lo, hi in bounding_box(Image(t, Box())))
+    ((-0.414214, 2.414214), (0.585786, 3.414214), (2.0, 4.0))
+    >>> bounding_box(Intersection(Box(), Sphere(1, [1,0,0]), evaluate=False))
+    ((0.0, 1.0), (-1.0, 1.0), (-1.0, 1.0))
+    >>> bounding_box(Intersection(Box(), Halfspace(0, [0,0,1]), evaluate=False))
+    ((-1.0, 1.0), (-1.0, 1.0), (0.0, 1.0))
+    >>> bounding_box(Union(Box(), Sphere(1, [2,0,0]), evaluate=False))
+    ((-1.0, 3.0), (-1.0, 1.0), (-1.0, 1.0))
+    """
+    try:
+        if hasattr(zet, '_bounding_box'):
+            return zet._bounding_box()
+
+        elif isinstance(zet, (Intersection, ClosedRegularizedIntersection, OpenRegularizedIntersection)):
+            boxes = [box for box in map(bounding_box, zet.args) if box is not None]
+            if not boxes:
+                return None
+            return tuple((max(lo for lo, _ in bds), min(hi for _, hi in bds))
+                         for bds in zip(*boxes))
+
+        elif isinstance(zet, (Union, ClosedRegularizedUnion, OpenRegularizedUnion)):
+            boxes = list(map(bounding_box, zet.args))
+            if None in boxes:
+                return None
+            return tuple((min(lo for lo, _ in bds), max(hi for _, hi in bds))
+                         for bds in zip(*boxes))
+
+        elif isinstance(zet, Complement):
+            return bounding_box(zet.args[0])
+
+        elif isinstance(zet, (ClosedRegularization, OpenRegularization)):
+            return bounding_box(zet.args[0])
+
+        elif isinstance(zet, Image) and hasattr(zet.function, 'as_numeric'):
+            box = bounding_box(zet.set)
+            if box is None or any(abs(v) == float('inf') for bd in box for v in bd):
+                return None
+            if any(lo > hi for lo, hi in box):
+                return box
+            from itertools import product
+            corners = zet.function.as_numeric()(list(product(*box)))
+            return tuple(zip(corners.min(axis=0).tolist(), corners.max(axis=0).tolist()))
+
+        else:
+            return None
+
+    except TypeError:
+        # non-numeric parameters
+        return None
+
+
+# interning
+
+class InternTable(LRUCache):
+    """
+    table of hash-consed sets, where structurally equal sets are kept as one
+    object with stable id, and boolean nodes are rebuilt from interned
+    arguments.  at most `maxsize` nodes are kept, and the least recently used
+    ones are dropped (a dropped node gets a new id when interned again).
+
+    >>> from sympy import *
+    >>> x = Symbol('x', real=True)
+    >>> table = InternTable()
+    >>> a = table.intern(Intersection(AbstractSet(x, x>0), AbstractSet(x, x<1), evaluate=False))
+    >>> b = table.intern(Intersection(AbstractSet(x, x>0), AbstractSet(x, x<1), evaluate=False))
+    >>> a is b, a.args[0] is table.intern(AbstractSet(x, x>0))
+    (True, True)
+    >>> table.id_of(a) == table.id_of(b)
+    True
+    >>> table.info()
+    CacheInfo(hits=4, misses=3, maxsize=65536, currsize=3)
+    >>> table = InternTable(maxsize=2)
+    >>> ids = [table.id_of(AbstractSet(x, x>n)) for n in range(3)]
+    >>> len(table), AbstractSet(x, x>0) in table, table.id_of(AbstractSet(x, x>0))
+    (2, False, 3)
+    """
+    node_types = (Intersection, Union, Complement, AbsoluteComplement,
+                  ClosedRegularization, ClosedRegularizedAbsoluteComplement,
+                  ClosedRegularizedIntersection, ClosedRegularizedUnion,
+                  OpenRegularization, OpenRegularizedAbsoluteComplement,
+                  OpenRegularizedIntersection, OpenRegularizedUnion)
+
+    def __init__(self, maxsize=65536):
+        LRUCache.__init__(self, maxsize)
+        self._next_id = 0
+
+    def intern(self, zet):
+        return self._entry(zet)[0]
+
+    def id_of(self, zet):
+        return self._entry(zet)[1]
+
+    def _entry(self, zet):
+        entry = self.get(zet)
+        if entry is not None:
+            return entry
+
+        if isinstance(zet, self.node_types):
+            args = tuple(map(self.intern, zet.args))
+            if any(arg is not arg_ for arg, arg_ in zip(args, zet.args)):
+                zet = Basic.__new__(type(zet), *args)
+        entry = (zet, self._next_id)
+        self._next_id += 1
+        self[zet] = entry
+        return entry
+
+intern_table = InternTable()
+
+def intern_set(zet):
+    return intern_table.intern(zet)
+
+def node_id(zet):
+    return intern_table.id_of(zet)
+
+
 class Topology(Set):
     @property
     def space(self):
@@ -1,15 +1,75 @@
 from itertools import *
+from functools import wraps
 from sympy.core import S, Symbol, Dummy
+from sympy.core.compatibility import lru_cache
 from sympy.logic import true, false, And, Or, Not
 from sympy.logic.boolalg import BooleanFunction
 from sympy.simplify import simplify
 
 from symplus.typlus import is_Matrix
+from symplus.util import LRUCache
+
+
+# cache
+
+_miss = object()
+
+class SimplificationCache(LRUCache):
+    """
+    LRU cache of results of simplifications, keyed by function and structural
+    hash of arguments.  unhashable arguments are not cached.
+
+    >>> from sympy import *
+    >>> cache = SimplificationCache(maxsize=2)
+    >>> x = Symbol("x")
+    >>> simp = cache.cached(simplify)
+    >>> simp(sin(x)**2 + cos(x)**2)
+    1
+    >>> simp(sin(x)**2 + cos(x)**2)
+    1
+    >>> cache.info()
+    CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+    >>> cache.disable()
+    >>> simp(sin(x)**2 + cos(x)**2)
+    1
+    >>> cache.info()
+    CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+    """
+    def __init__(self, maxsize=4096):
+        LRUCache.__init__(self, maxsize)
+        self.enabled = True
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def cached(self, func):
+        @wraps(func)
+        def cached_func(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            key = (func, args, frozenset(kwargs.items()))
+            try:
+                res = self.get(key, _miss)
+            except TypeError:
+                return func(*args, **kwargs)
+            if res is _miss:
+                res = func(*args, **kwargs)
+                self[key] = res
+            return res
+        return cached_func
+
+simplification_cache = SimplificationCache()
+
+cached_simplify = simplification_cache.cached(simplify)
 
 
 # sqrt
 # Ref: http://mathforum.org/library/drmath/view/65302.html
 
+@simplification_cache.cached
 def sqrtsimp(expr):
     """
     >>> from sympy import *
@@ -56,6 +116,41 @@ def with_sqrtsimp(*simplifies):
 
     return simplify_with_sqrtsimp
 
+@lru_cache(maxsize=4096)
+def canonicalize_radical(expr):
+    """
+    canonical form of real radical number (or matrix of them): denest square
+    roots, rationalize denominators, pull out rational content of radicands,
+    then expand into sum of products of radicals.  numbers in the same field
+    have expansion over the same basis, so the size of expression is bounded
+    under repeated rotations.  non-radical expression is returned as it is.
+
+    >>> from sympy import *
+    >>> from symplus.strplus import init_mprinting
+    >>> init_mprinting()
+    >>> canonicalize_radical(sqrt(10*sqrt(5) + 50)/(sqrt(2) + 1))
+    -sqrt(10)*sqrt(sqrt(5) + 5) + 2*sqrt(5)*sqrt(sqrt(5) + 5)
+    >>> canonicalize_radical(sqrt(2*sqrt(5) + 10))
+    sqrt(2)*sqrt(sqrt(5) + 5)
+    >>> canonicalize_radical(sqrt(7 + 4*sqrt(3)))
+    sqrt(3) + 2
+    """
+    from sympy.core import Float
+    from sympy.core.function import expand
+    from sympy.simplify import radsimp
+    from sympy.core.exprtools import factor_terms
+
+    if is_Matrix(expr):
+        return expr.applyfunc(canonicalize_radical)
+    if not getattr(expr, 'is_number', False) or expr.is_Rational or expr.has(Float):
+        return expr
+
+    expr = radsimp(sqrtsimp(expr))
+    expr = expr.replace(
+        lambda e: e.is_Pow and e.exp.is_Rational and e.base.is_Add,
+        lambda e: factor_terms(e.base)**e.exp)
+    return expand(expr)
+
 
 # relational
 from sympy.assumptions import Q, ask
@@ -141,6 +236,7 @@ def is_polynomial(expr):
 
 def is_simplerel(expr):
     from sympy.logic.boolalg import _find_predicates
+    from sympy.core.compatibility import default_sort_key
 
     variables = _find_predicates(expr)
     relations = tuple(v for v in variables if isinstance(v, Rel))
@@ -149,6 +245,7 @@ def is_simplerel(expr):
     simple_form = {Eq: Eq, Ne: Eq,
                    Gt: Gt, Le: Gt,
                    Lt: Lt, Ge: Lt}
+    relations = sorted(relations, key=lambda r: default_sort_key(r.args[0]))
     return all(len(set(simple_form[rel.func] for rel in rels)) == 1
                for _, rels in groupby(relations, lambda r: r.args[0]))
 
@@ -278,6 +375,7 @@ def canonicalize_polyeq(eq):
 
     return rel(expr, 0)
 
+@simplification_cache.cached
 def polyrelsimp(expr):
     """expand (polynomial) equation/inequation and canonicalize it
     >>> from sympy import *
@@ -319,8 +417,12 @@ def polyrelsimp(expr):
                         lambda rel: expand_polyeq(rel))
 
 # WARNING: it is unstable
-def logicrelsimp(expr, form='dnf', deep=True):
+@simplification_cache.cached
+def logicrelsimp(expr, form='dnf', deep=True, method='cube'):
     """ logically simplify relations using totality (WARNING: it is unstable)
+    `method='cube'` covers the expression by multi-valued cubes over signs of
+    polynomials, and only visits satisfiable assignments; `method='table'`
+    minimizes full truth table by `SOPform` or `POSform`.
     >>> from sympy import *
     >>> from symplus.strplus import init_mprinting
     >>> init_mprinting()
@@ -335,6 +437,8 @@ def logicrelsimp(expr, form='dnf', deep=True):
     (x < 0) /\ (y < 0) \/ (x > 0) /\ (y > 0)
     >>> logicrelsimp(((x<0) & (y>0)) | ((x>0) & (y<0)))
     (x < 0) /\ (y > 0) \/ (x > 0) /\ (y < 0)
+    >>> logicrelsimp((x+y>0) & ((x-y>0) | (x+y<=1)) | (x+y>=1) & (x-y>0))
+    (x + y =< 1) /\ (x > -y) \/ (x + y >= 1) /\ (x > y)
     """
     from sympy.core.symbol import Wild
     from sympy.core import sympify
@@ -344,6 +448,8 @@ def logicrelsimp(expr, form='dnf', deep=True):
 
     if form not in ('cnf', 'dnf'):
         raise ValueError("form can be cnf or dnf only")
+    if method not in ('cube', 'table'):
+        raise ValueError("method can be cube or table only")
     expr = sympify(expr)
     if not isinstance(expr, BooleanFunction):
         return expr
@@ -373,8 +479,11 @@ def logicrelsimp(expr, form='dnf', deep=True):
         expr = expr.replace(Ge(w,0), Or(Gt(w,0), Eq(w,0)))
         expr = expr.replace(Le(w,0), Or(Lt(w,0), Eq(w,0)))
 
-        # make totality
         variables = _find_predicates(expr)
+        if method == 'cube':
+            return _mvsimp(expr, variables, form, deep)
+
+        # make totality
         relations = (v for v in variables if isinstance(v, Rel) and v.args[1] == 0)
         totalities = []
         for a in set(rel.args[0] for rel in relations):
@@ -403,6 +512,140 @@ def logicrelsimp(expr, form='dnf', deep=True):
 
         return expr
 
+# multi-valued cube: each variable is sign of polynomial, (1, 0, -1), or truth
+# value of other predicate, (1, 0); cube is tuple of frozensets of values.
+
+def _mvvariables(expr, predicates):
+    # replace predicates by boolean atoms, which are much faster to substitute
+    from sympy.core.compatibility import default_sort_key
+
+    variables = []
+    polys = {}
+    atoms = {}
+    signs = {}
+    sign = {Gt: 1, Eq: 0, Lt: -1}
+    for pred in sorted(predicates, key=default_sort_key):
+        atom = atoms[pred] = Dummy()
+        if isinstance(pred, (Gt, Eq, Lt)) and pred.args[1] == 0:
+            if pred.args[0] not in polys:
+                polys[pred.args[0]] = []
+                variables.append((pred.args[0], (1, 0, -1), polys[pred.args[0]]))
+            polys[pred.args[0]].append(atom)
+            signs[atom] = sign[pred.func]
+        else:
+            variables.append((pred, (1, 0), [atom]))
+            signs[atom] = 1
+
+    def subs(n, value):
+        return dict((atom, true if signs[atom] == value else false)
+                    for atom in variables[n][2])
+    return expr.xreplace(atoms), variables, subs
+
+def _mvsubcube(cube1, cube2):
+    return all(a <= b for a, b in zip(cube1, cube2))
+
+def _mvnext(expr, variables, n):
+    # next variable which appears in `expr`
+    while not expr.has(*variables[n][2]):
+        n += 1
+    return n
+
+def _mvcontains(expr, cube, variables, subs, target):
+    # whether all assignments in `cube` make `expr` equal to `target`
+    fixed = {}
+    for n, values in enumerate(cube):
+        if len(values) == 1:
+            fixed.update(subs(n, next(iter(values))))
+    expr = expr.xreplace(fixed)
+
+    def contains(expr, n):
+        if expr == target:
+            return True
+        elif expr in (true, false):
+            return False
+        n = _mvnext(expr, variables, n)
+        return all(contains(expr.xreplace(subs(n, value)), n+1) for value in cube[n])
+    return contains(expr, 0)
+
+def _mvcovered(cube, cubes):
+    # whether `cube` is covered by union of `cubes`
+    cubes = [c for c in cubes if all(a & b for a, b in zip(cube, c))]
+    if any(_mvsubcube(cube, c) for c in cubes):
+        return True
+    if not cubes:
+        return False
+    n = next(n for n, c in enumerate(cubes[0]) if not cube[n] <= c)
+    return all(_mvcovered(cube[:n] + (frozenset([value]),) + cube[n+1:], cubes)
+               for value in cube[n])
+
+def _mvcover(expr, variables, subs, target):
+    # irredundant cover of prime cubes, which is found by searching satisfiable
+    # assignments, skipping the region covered by found primes
+    full = tuple(frozenset(domain) for _, domain, _ in variables)
+    cubes = []
+
+    def expand(cube):
+        for n in range(len(cube)):
+            if cube[n] == full[n]:
+                continue
+            cube_ = cube[:n] + (full[n],) + cube[n+1:]
+            if _mvcontains(expr, cube_, variables, subs, target):
+                cube = cube_
+                continue
+            for value in sorted(full[n]-cube[n], reverse=True):
+                cube_ = cube[:n] + (cube[n] | frozenset([value]),) + cube[n+1:]
+                if _mvcontains(expr, cube_, variables, subs, target):
+                    cube = cube_
+        return cube
+
+    def search(expr_, cube, n):
+        if any(_mvsubcube(cube, c) for c in cubes):
+            return
+        if expr_ == target:
+            cube = expand(cube)
+            cubes[:] = [c for c in cubes if not _mvsubcube(c, cube)]
+            cubes.append(cube)
+        elif expr_ not in (true, false):
+            n = _mvnext(expr_, variables, n)
+            for value in full[n]:
+                cube_ = cube[:n] + (frozenset([value]),) + cube[n+1:]
+                search(expr_.xreplace(subs(n, value)), cube_, n+1)
+    search(expr, full, 0)
+
+    # irredundant
+    cubes.sort(key=lambda c: sum(map(len, c)))
+    for cube in list(cubes):
+        others = [c for c in cubes if c is not cube]
+        if _mvcovered(cube, others):
+            cubes = others
+    return cubes
+
+def _mvliteral(var, domain, values):
+    if len(domain) == 2:
+        return var if 1 in values else Not(var)
+    rels = {frozenset([1]): Gt, frozenset([0]): Eq, frozenset([-1]): Lt,
+            frozenset([1, 0]): Ge, frozenset([0, -1]): Le, frozenset([1, -1]): Ne}
+    return rels[values](var, 0)
+
+def _mvsimp(expr, predicates, form, deep):
+    expr, variables, subs = _mvvariables(expr, predicates)
+    literal = _mvliteral
+    if deep:
+        literal = lambda var, domain, values: simplify(_mvliteral(var, domain, values))
+
+    if form == 'dnf':
+        cubes = _mvcover(expr, variables, subs, true)
+        return Or(*[And(*[literal(var, domain, values)
+                          for (var, domain, _), values in zip(variables, cube)
+                          if len(values) < len(domain)])
+                    for cube in cubes])
+    else:
+        cubes = _mvcover(expr, variables, subs, false)
+        return And(*[Or(*[literal(var, domain, frozenset(domain)-values)
+                          for (var, domain, _), values in zip(variables, cube)
+                          if len(values) < len(domain)])
+                     for cube in cubes])
+
 
 # matrix
 
@@ -410,6 +653,7 @@ def do_indexing(expr):
     from sympy.matrices.expressions.matexpr import MatrixElement
     return expr.replace(MatrixElement, lambda parent, i, j: parent[i,j])
 
+@simplification_cache.cached
 def matsimp(expr):
     """do indexing, Trace, Determinant and expand matrix equation
     >>> from sympy import *